@@ -7,6 +7,19 @@ from core.bot import bot   # Инициализация бота
 from core.dp import dp     # Инициализация диспетчера
 from utils.database import init_db
 from aiogram import Router
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from utils.config import (
+    BOT_MODE,
+    WEBHOOK_BASE_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    UPDATE_PARTITIONS,
+    WORKER_INDEX,
+)
+from utils.update_stream import build_webhook_ingress_app, run_polling_ingress, run_worker
 
 logging.basicConfig(level=logging.INFO)
 
@@ -22,6 +35,40 @@ async def set_commands_for_chat():
     
     await bot.set_my_commands(base_commands)
 
+async def run_webhook(ingress: bool = False):
+    """Приём апдейтов через встроенный aiohttp-сервер вместо long polling"""
+    if ingress:
+        app = build_webhook_ingress_app(WEBHOOK_PATH, WEBHOOK_SECRET)
+    else:
+        app = web.Application()
+        SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            secret_token=WEBHOOK_SECRET,
+        ).register(app, path=WEBHOOK_PATH)
+        setup_application(app, dp, bot=bot)
+
+    if WEBHOOK_BASE_URL:
+        await bot.set_webhook(
+            f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=False,
+        )
+    else:
+        logging.warning("WEBHOOK_BASE_URL is not set, webhook is not registered in Telegram")
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBAPP_HOST, port=WEBAPP_PORT)
+    await site.start()
+    print(f"✅ Бот запущен (webhook на {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
 async def main():
     print("🔄 Настройка базы данных...")
     await init_db()
@@ -32,7 +79,23 @@ async def main():
     dp.include_router(router)
     
     # Убедитесь, что все middleware и другие настройки правильно подключены
+    if BOT_MODE == "worker":
+        print(f"✅ Воркер {WORKER_INDEX} запущен!")
+        await run_worker(bot, dp)
+        return
+
+    ingress = UPDATE_PARTITIONS > 0
+    if BOT_MODE == "webhook":
+        await run_webhook(ingress=ingress)
+        return
+
+    if ingress:
+        print(f"✅ Ingress запущен: апдейты уходят в {UPDATE_PARTITIONS} партиций Redis Streams")
+        await run_polling_ingress(bot, dp)
+        return
+
     print("✅ Бот запущен!")
+    await bot.delete_webhook(drop_pending_updates=False)
     await dp.start_polling(bot)
 
 if __name__ == "__main__":
@@ -15,7 +15,12 @@ from handlers.organizer_map import router as organizer_map_router
 from handlers.student_map import router as student_map_router
 
 from utils.order_expirer import expire_orders_loop
-from utils.config import REDIS_URL
+from utils.broadcast import broadcast_worker_loop
+from utils.database import leaderboard_reconcile_loop
+from utils.qr_sheet import shutdown_executor as shutdown_qr_executor
+from utils.config import REDIS_URL, UPDATE_CONCURRENCY
+from middlewares.ordering import UserOrderingMiddleware
+from middlewares.throttling import ThrottlingMiddleware
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,13 +29,42 @@ redis_client = redis.from_url(REDIS_URL)
 storage = RedisStorage(redis_client)
 
 dp = Dispatcher(storage=storage)
+dp.update.outer_middleware(UserOrderingMiddleware(UPDATE_CONCURRENCY))
 
 
 async def _on_startup(dispatcher: Dispatcher):
     asyncio.create_task(expire_orders_loop())
+    asyncio.create_task(broadcast_worker_loop())
+    asyncio.create_task(leaderboard_reconcile_loop())
+
+
+async def _on_shutdown(dispatcher: Dispatcher):
+    shutdown_qr_executor()
 
 
 dp.startup.register(_on_startup)
+dp.shutdown.register(_on_shutdown)
+
+
+def _throttle(router, group: str):
+    mw = ThrottlingMiddleware(redis_client, default_key=group)
+    router.message.middleware(mw)
+    router.callback_query.middleware(mw)
+
+
+_throttle(student.router, "default")
+_throttle(student_map_router, "default")
+_throttle(common.router, "default")
+_throttle(shop_router, "shop")
+for _admin_router in (
+    organizer.router,
+    organizer_map_router,
+    organizer_orders_router,
+    organizer_codes_router,
+    organizer_inventory_router,
+    texts_editor_router,
+):
+    _throttle(_admin_router, "admin")
 
 
 dp.include_router(student.router)
@@ -49,6 +49,7 @@ class Code(Base):
     starts_at = Column(DateTime(timezone=True), nullable=True)
     expires_at = Column(DateTime(timezone=True), nullable=True)
     max_uses = Column(Integer, nullable=True)
+    uses_count = Column(Integer, nullable=False, server_default="0")
 
 
 class UserCode(Base):
@@ -125,3 +126,58 @@ class ProductImage(Base):
 
     is_main = Column(Boolean, nullable=False, server_default="false")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class BroadcastJob(Base):
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(BigInteger, primary_key=True)
+    text = Column(String, nullable=False)
+
+    status = Column(String, nullable=False, server_default="PENDING")
+    created_by = Column(BigInteger, nullable=True)
+
+    progress_chat_id = Column(BigInteger, nullable=True)
+    progress_message_id = Column(BigInteger, nullable=True)
+
+    total = Column(Integer, nullable=False, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class BroadcastDelivery(Base):
+    __tablename__ = "broadcast_deliveries"
+
+    job_id = Column(BigInteger, ForeignKey("broadcast_jobs.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+
+    status = Column(String, nullable=False, server_default="PENDING")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    error = Column(String, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class PointsLedger(Base):
+    __tablename__ = "points_ledger"
+
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    delta = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)
+
+    code_id = Column(Integer, nullable=True)
+    order_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class StockLedger(Base):
+    __tablename__ = "stock_ledger"
+
+    id = Column(BigInteger, primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    delta = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)
+
+    order_id = Column(Integer, nullable=True)
+    actor_id = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
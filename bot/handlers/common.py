@@ -1,12 +1,13 @@
 import logging
 
 from aiogram import Router, types
-from aiogram.filters import Command, CommandStart
+from aiogram.filters import Command, CommandObject, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
 from core.bot import bot
+from handlers.student import redeem_and_reply
 from keyboards.organizer_keyboards import organizer_menu
 from keyboards.student_keyboards import main_menu
 from texts.storage import get_template, render, send_template
@@ -83,19 +84,38 @@ def faculty_keyboard():
     )
 
 
+def _deep_link_code(command: CommandObject | None) -> str | None:
+    code = ((command.args if command else None) or "").strip().upper()
+    if len(code) < 4 or not (code.isascii() and code.isalnum()):
+        return None
+    return code
+
+
+@router.message(CommandStart(deep_link=True), flags={"throttling_key": "code"})
+async def cmd_start_with_code(message: types.Message, state: FSMContext, command: CommandObject):
+    await cmd_start(message, state, command)
+
+
 @router.message(CommandStart())
-async def cmd_start(message: types.Message, state: FSMContext):
+async def cmd_start(message: types.Message, state: FSMContext, command: CommandObject = None):
     user_id = message.from_user.id
-    keyboard = await role_keyboard(user_id)
+    code = _deep_link_code(command)
 
     await state.clear()
 
     if await is_user_registered(user_id):
+        if code:
+            await redeem_and_reply(message, code)
+            return
+        keyboard = await role_keyboard(user_id)
         await send_template(bot, message, "start_already_registered", reply_markup=keyboard)
         return
 
     await send_template(bot, message, "start_intro")
     await state.set_state(RegistrationState.waiting_for_name)
+    if code:
+        # Код из ссылки применяется сразу после регистрации
+        await state.update_data(pending_code=code)
 
 
 @router.message(RegistrationState.waiting_for_name)
@@ -156,6 +176,10 @@ async def process_faculty(message: types.Message, state: FSMContext):
 
     await state.clear()
 
+    pending_code = user_data.get("pending_code")
+    if pending_code:
+        await redeem_and_reply(message, pending_code)
+
 
 @router.message(Command("home"))
 async def cmd_home(message: types.Message):
@@ -20,6 +20,7 @@ from keyboards.student_keyboards import main_menu
 from utils.database import (
     is_admin,
     get_all_students_rating,
+    get_rating_page,
     get_codes_usage,
     add_event,
     get_events,
@@ -37,6 +38,7 @@ from utils.shop_db import (
 router = Router()
 ACTIVE_CODES_PAGE_SIZE = 8
 PRODUCTS_PAGE_SIZE = 10
+RATING_PAGE_SIZE = 50
 
 class OrganizerStates(StatesGroup):
     waiting_for_notification = State()
@@ -157,6 +159,28 @@ def _render_active_codes_page(codes: list[dict], page: int) -> str:
     return "\n".join(lines).rstrip()
 
 
+def _render_rating_page(rows: list[dict], first_rank: int) -> str:
+    lines = ["🔥 Полный рейтинг", ""]
+    if not rows:
+        lines.append("Больше студентов нет.")
+    for place, student in enumerate(rows, first_rank):
+        lines.append(f"{place}. {student['name']} — {student['balance']}")
+    return "\n".join(lines)
+
+
+def _rating_page_kb(rows: list[dict], first_rank: int) -> InlineKeyboardMarkup:
+    nav = []
+    if first_rank > 1:
+        nav.append(InlineKeyboardButton(text="⏮ В начало", callback_data="org:rating:first"))
+    if len(rows) == RATING_PAGE_SIZE:
+        last = rows[-1]
+        nav.append(InlineKeyboardButton(
+            text="➡️",
+            callback_data=f"org:rating:after:{last['balance']}:{last['id']}:{first_rank + len(rows)}",
+        ))
+    return InlineKeyboardMarkup(inline_keyboard=[nav] if nav else [])
+
+
 def _chunk_text_lines(lines: list[str], limit: int = 3500) -> list[str]:
     chunks: list[str] = []
     current = ""
@@ -205,14 +229,21 @@ async def handle_rating_limit(message: types.Message, state: FSMContext):
     elif message.text == "50 студентов":
         limit = 50
     elif message.text == "Весь список":
-        limit = None
+        await state.clear()
+        rows = await get_rating_page(after=None, limit=RATING_PAGE_SIZE)
+        await message.answer(
+            _render_rating_page(rows, first_rank=1),
+            reply_markup=_rating_page_kb(rows, first_rank=1),
+        )
+        await message.answer(ADMIN_PANEL_TEXT, reply_markup=organizer_menu())
+        return
     else:
         await message.answer("❌ Неправильный выбор!", reply_markup=rating_menu())
         return
 
     rating = await get_all_students_rating(limit=limit)
 
-    title = f"🔥 Рейтинг (топ {limit})" if limit else "🔥 Полный рейтинг"
+    title = f"🔥 Рейтинг (топ {limit})"
     lines = [title, ""]
     for place, student in enumerate(rating, 1):
         lines.append(f"{place}. {student['name']} — {student['balance']}")
@@ -223,6 +254,24 @@ async def handle_rating_limit(message: types.Message, state: FSMContext):
         await message.answer(chunk, reply_markup=markup)
     await state.clear()
 
+@router.callback_query(F.data.startswith("org:rating:"))
+async def rating_page(callback: types.CallbackQuery):
+    if not await ensure_admin_cb(callback):
+        return
+
+    parts = callback.data.split(":")
+    if parts[2] == "first":
+        after, first_rank = None, 1
+    else:
+        after, first_rank = (int(parts[3]), int(parts[4])), int(parts[5])
+
+    rows = await get_rating_page(after=after, limit=RATING_PAGE_SIZE)
+    await callback.message.edit_text(
+        _render_rating_page(rows, first_rank=first_rank),
+        reply_markup=_rating_page_kb(rows, first_rank=first_rank),
+    )
+    await callback.answer()
+
 @router.message(F.text == "📢 Уведомление")
 async def start_notify(message: types.Message, state: FSMContext):
     if not await ensure_admin(message):
@@ -262,11 +311,16 @@ async def process_confirm_send_notification(callback: types.CallbackQuery, state
 
     data = await state.get_data()
     notification_text = data.get("notification_text", "")
-    await send_notification(notification_text)
+    await state.clear()
 
-    await callback.message.edit_text("✅ Уведомление отправлено.")
+    await callback.message.edit_text("⏳ Рассылка поставлена в очередь…")
+    await send_notification(
+        notification_text,
+        created_by=callback.from_user.id,
+        progress_chat_id=callback.message.chat.id,
+        progress_message_id=callback.message.message_id,
+    )
     await callback.answer()
-    await state.clear()
 
 @router.callback_query(OrganizerStates.confirming_notification, F.data == "org:notify:cancel")
 async def process_cancel_send_notification(callback: types.CallbackQuery, state: FSMContext):
@@ -1,5 +1,5 @@
-import secrets
-import string
+import csv
+import io
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
@@ -8,14 +8,18 @@ from aiogram.filters import Command
 from aiogram.filters.state import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile, FSInputFile
 
 from keyboards.organizer_keyboards import organizer_menu, ADMIN_PANEL_TEXT
 from keyboards.student_keyboards import main_menu
+from utils.qr_sheet import get_sheet, is_deep_link_safe
 from utils.database import (
     is_admin,
     check_code_exists,
     add_code_to_event,
+    add_codes_bulk,
+    pick_free_code,
+    BULK_CODES_MAX,
     get_events,
     get_codes_usage,
     delete_code,
@@ -36,18 +40,21 @@ class CodesStates(StatesGroup):
     waiting_for_duration = State()
     waiting_for_max_uses = State()
     waiting_for_code_to_delete = State()
+    waiting_for_bulk_count = State()
 
 
-def generate_random_code(length: int = 10) -> str:
-    chars = string.ascii_letters + string.digits
-    return "".join(secrets.choice(chars) for _ in range(length))
+async def generate_unique_code(length: int = 10) -> str:
+    return await pick_free_code(length)
 
 
-async def generate_unique_code(length: int = 10) -> str:
-    while True:
-        code = generate_random_code(length).upper()
-        if not await check_code_exists(code):
-            return code
+def _codes_csv(codes: list[str], points: int, starts_at: datetime | None, expires_at: datetime | None) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["code", "points", "starts_at", "expires_at"])
+    for code in codes:
+        writer.writerow([code, points, _fmt_local(starts_at), _fmt_local(expires_at)])
+    # BOM, чтобы Excel открыл кириллицу и разделители без вопросов
+    return buf.getvalue().encode("utf-8-sig")
 
 
 async def ensure_admin(message: types.Message):
@@ -219,8 +226,10 @@ async def codes_event_pick(call: types.CallbackQuery, state: FSMContext):
 
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="➕ Создать код", callback_data="codes:add")],
+        [InlineKeyboardButton(text="📦 Пакет кодов", callback_data="codes:bulk")],
         [InlineKeyboardButton(text="🗑 Удалить код", callback_data="codes:delete")],
         [InlineKeyboardButton(text="📜 Показать коды", callback_data="codes:list")],
+        [InlineKeyboardButton(text="🖨 QR-лист (PDF)", callback_data="codes:qr")],
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="codes:root")]
     ])
 
@@ -263,17 +272,85 @@ async def codes_list(call: types.CallbackQuery, state: FSMContext):
     await call.answer()
 
 
+def _printable(c: dict) -> bool:
+    if c["status"] == "expired":
+        return False
+    return c.get("max_uses") is None or c["usage_count"] < c["max_uses"]
+
+
+@router.callback_query(F.data == "codes:qr")
+async def codes_qr(call: types.CallbackQuery, state: FSMContext):
+    if not await ensure_admin_cb(call):
+        return
+
+    event_id = (await state.get_data()).get("event_id")
+    printable = [c for c in await get_codes_usage(event_id=event_id) if _printable(c)]
+    # Коды вне [A-Za-z0-9_-] дали бы ссылку, открывающую бота без кода
+    items = [c for c in printable if is_deep_link_safe(c["code"])]
+    skipped = [c["code"] for c in printable if not is_deep_link_safe(c["code"])]
+    if skipped:
+        await call.message.answer(
+            "⚠️ Эти коды не попали в QR-лист: Telegram не передаёт их в ссылке /start, "
+            "студентам придётся вводить их вручную:\n" + "\n".join(skipped)
+        )
+    if not items:
+        await call.answer("Нет действующих кодов для QR", show_alert=True)
+        return
+
+    await call.answer("Готовлю лист…")
+    me = await call.bot.me()
+    # Шрифт по умолчанию в Pillow без кириллицы, поэтому подпись — только баллы
+    sheet = [(c["code"], f"+{c['points']}") for c in items]
+    path = await get_sheet(me.username, sheet)
+
+    await call.message.answer_document(
+        FSInputFile(path, filename=f"qr_event_{event_id}.pdf"),
+        caption=f"🖨 QR-коды: {len(items)} шт. Каждый QR открывает бота по ссылке /start <код>.",
+        reply_markup=organizer_menu(),
+    )
+
+
 @router.callback_query(F.data == "codes:add")
 async def codes_add_start(call: types.CallbackQuery, state: FSMContext):
     if not await ensure_admin_cb(call):
         await state.clear()
         return
 
+    await state.update_data(bulk_count=None)
     await call.message.answer("Введите количество баллов (> 0):")
     await state.set_state(CodesStates.waiting_for_code_points)
     await call.answer()
 
 
+@router.callback_query(F.data == "codes:bulk")
+async def codes_bulk_start(call: types.CallbackQuery, state: FSMContext):
+    if not await ensure_admin_cb(call):
+        await state.clear()
+        return
+
+    await call.message.answer(f"Сколько одноразовых кодов создать? (1–{BULK_CODES_MAX})")
+    await state.set_state(CodesStates.waiting_for_bulk_count)
+    await call.answer()
+
+
+@router.message(CodesStates.waiting_for_bulk_count)
+async def codes_bulk_count(message: types.Message, state: FSMContext):
+    if not await ensure_admin(message):
+        return
+
+    try:
+        count = int(message.text)
+        if not 1 <= count <= BULK_CODES_MAX:
+            raise ValueError
+    except Exception:
+        await message.answer(f"❌ Нужно целое число от 1 до {BULK_CODES_MAX}")
+        return
+
+    await state.update_data(bulk_count=count)
+    await message.answer("Введите количество баллов за каждый код (> 0):")
+    await state.set_state(CodesStates.waiting_for_code_points)
+
+
 @router.message(CodesStates.waiting_for_code_points)
 async def codes_points(message: types.Message, state: FSMContext):
     if not await ensure_admin(message):
@@ -288,6 +365,9 @@ async def codes_points(message: types.Message, state: FSMContext):
         return
 
     await state.update_data(points=points)
+    if (await state.get_data()).get("bulk_count"):
+        await _ask_starts_delay(message, state)
+        return
     await message.answer("Введите код или '-' для генерации:")
     await state.set_state(CodesStates.waiting_for_code_value)
 
@@ -302,15 +382,18 @@ async def codes_value(message: types.Message, state: FSMContext):
         code = await generate_unique_code()
     else:
         code = raw.upper()
-        if not code.isalnum() or len(code) < 4:
-            await message.answer("❌ Только латиница/цифры, длина ≥ 4")
+        if not (code.isascii() and code.isalnum()) or not 4 <= len(code) <= 64:
+            await message.answer("❌ Только латиница/цифры, длина от 4 до 64")
             return
         if await check_code_exists(code):
             await message.answer("❌ Такой код уже существует")
             return
 
     await state.update_data(code=code)
+    await _ask_starts_delay(message, state)
 
+
+async def _ask_starts_delay(message: types.Message, state: FSMContext):
     await message.answer(
         "Через сколько код НАЧНЁТ действовать?\n"
         "Примеры: 0, 10m, 2h, 1d\n"
@@ -369,6 +452,10 @@ async def codes_duration(message: types.Message, state: FSMContext):
 
     await state.update_data(expires_at=_dt_to_utc_iso(expires_at))
 
+    if data.get("bulk_count"):
+        await _finish_bulk(message, state)
+        return
+
     await message.answer(
         "Лимит использований?\n"
         "Число ≥ 1 или '-'"
@@ -412,6 +499,36 @@ async def codes_max_uses(message: types.Message, state: FSMContext):
     await state.clear()
 
 
+async def _finish_bulk(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    starts_at = _iso_to_dt(data.get("starts_at"))
+    expires_at = _iso_to_dt(data.get("expires_at"))
+
+    try:
+        codes = await add_codes_bulk(
+            event_id=data["event_id"],
+            count=data["bulk_count"],
+            points=data["points"],
+            starts_at=starts_at,
+            expires_at=expires_at,
+            max_uses=1,
+        )
+    except Exception:
+        await message.answer("❌ Не удалось создать коды, попробуйте ещё раз.", reply_markup=organizer_menu())
+        await state.clear()
+        return
+
+    await message.answer_document(
+        BufferedInputFile(
+            _codes_csv(codes, data["points"], starts_at, expires_at),
+            filename=f"codes_event_{data['event_id']}.csv",
+        ),
+        caption=f"✅ Создано {len(codes)} одноразовых кодов | ➕ {data['points']}",
+        reply_markup=organizer_menu(),
+    )
+    await state.clear()
+
+
 @router.callback_query(F.data == "codes:delete")
 async def codes_delete_start(call: types.CallbackQuery, state: FSMContext):
     if not await ensure_admin_cb(call):
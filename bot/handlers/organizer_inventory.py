@@ -88,7 +88,7 @@ async def _build_inventory_pages() -> list[str]:
                 p.stock,
                 p.is_active,
                 COALESCE(r.reserved_qty, 0) AS reserved_qty,
-                COALESCE(f.fulfilled_qty, 0) AS fulfilled_qty
+                GREATEST(COALESCE(l.out_qty, 0) - COALESCE(r.reserved_qty, 0), 0) AS fulfilled_qty
             FROM products p
             LEFT JOIN (
                 SELECT oi.product_id, SUM(oi.qty)::int AS reserved_qty
@@ -98,12 +98,14 @@ async def _build_inventory_pages() -> list[str]:
                 GROUP BY oi.product_id
             ) r ON r.product_id = p.id
             LEFT JOIN (
-                SELECT oi.product_id, SUM(oi.qty)::int AS fulfilled_qty
-                FROM order_items oi
-                JOIN orders o ON o.id = oi.order_id
-                WHERE o.status = 'FULFILLED'
-                GROUP BY oi.product_id
-            ) f ON f.product_id = p.id
+                -- Ушло со склада по заказам (резерв и выдача минус возвраты);
+                -- выдано = это минус то, что ещё лежит в резерве. Заказы, бывшие до
+                -- журнала, перенесены в него бэкфиллом из init.sql (строки reserve/issue).
+                SELECT product_id, (-SUM(delta))::int AS out_qty
+                FROM stock_ledger
+                WHERE reason IN ('reserve', 'issue', 'release', 'expire')
+                GROUP BY product_id
+            ) l ON l.product_id = p.id
             ORDER BY p.id ASC
             """
         )
@@ -162,7 +164,7 @@ async def _build_inventory_pages() -> list[str]:
                 f"сумма {int(o['total_points'] or 0)} | {o['created_at']}"
             )
 
-    blocks.append("ℹ️ Примечание: 'выдано' считается по заказам со статусом FULFILLED и qty из order_items.")
+    blocks.append("ℹ️ Примечание: 'выдано' считается по журналу склада (stock_ledger), включая перенесённую историю заказов; частичные выдачи до появления журнала учтены полным количеством.")
     pages = _paginate_inventory_blocks(blocks)
     total_pages = len(pages)
     return [
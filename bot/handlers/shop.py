@@ -4,18 +4,16 @@ from aiogram.types import InputMediaPhoto
 from keyboards.student_keyboards import main_menu
 from keyboards.shop_keyboards import shop_item_kb, shop_cart_kb
 from utils.shop_db import (
-    get_products,
+    get_shop_view,
     get_or_create_draft_order,
     add_item,
     remove_item,
-    get_item_qty,
     get_order_items,
     calc_order_total,
     checkout_order,
-    get_checked_out_order_id, get_product_main_image, get_active_order_id
+    get_checked_out_order_id, get_active_order_id
 )
 from utils.database import get_balance
-from utils.shop_db import get_cart_qty
 
 router = Router()
 
@@ -81,8 +79,8 @@ async def upsert_product_message(call_or_msg, text: str, kb, photo_file_id: str
 
 
 async def show_product(message_or_call, user_id: int, idx: int):
-    products = await get_products()
-    if not products:
+    view = await get_shop_view(user_id, idx)
+    if view is None:
         text = "🛍 Магазин пока пуст"
         if isinstance(message_or_call, types.CallbackQuery):
             await upsert_product_message(message_or_call, text, None, None)
@@ -90,11 +88,7 @@ async def show_product(message_or_call, user_id: int, idx: int):
             await message_or_call.answer(text, reply_markup=main_menu())
         return
 
-    idx = idx % len(products)
-    product = products[idx]
-
-    checked_out = await get_checked_out_order_id(user_id)
-    if checked_out:
+    if view["checked_out"]:
         text = "✅ У тебя уже есть оформленный заказ. Дождись выдачи мерча у организаторов."
         if isinstance(message_or_call, types.CallbackQuery):
             await message_or_call.answer(text, show_alert=True)
@@ -102,18 +96,14 @@ async def show_product(message_or_call, user_id: int, idx: int):
             await message_or_call.answer(text, reply_markup=main_menu())
         return
 
-    order_id = await get_or_create_draft_order(user_id)
-    qty = await get_item_qty(order_id, product["id"])
-    cart_qty = await get_cart_qty(order_id)
-    balance = await get_balance(user_id)
-
-    text = render_product_text(product, qty, balance, idx, len(products))
-    kb = shop_item_kb(idx=idx, product_id=product["id"], qty=qty, cart_qty=cart_qty)
+    product = view["product"]
+    idx = view["idx"]
+    qty = view["qty"]
 
-    img = await get_product_main_image(product["id"])
-    photo_file_id = img["telegram_file_id"] if img else None
+    text = render_product_text(product, qty, view["balance"], idx, view["total_count"])
+    kb = shop_item_kb(idx=idx, product_id=product["id"], qty=qty, cart_qty=view["cart_qty"])
 
-    await upsert_product_message(message_or_call, text, kb, photo_file_id)
+    await upsert_product_message(message_or_call, text, kb, product.get("telegram_file_id"))
 
 @router.message(lambda m: m.text == "🛍 Магазин")
 async def shop_open(message: types.Message):
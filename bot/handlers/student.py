@@ -1,4 +1,4 @@
-from aiogram import Router, types
+from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
@@ -7,11 +7,21 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeybo
 from core.bot import bot
 from keyboards.organizer_keyboards import organizer_menu, ADMIN_BACK_TEXT
 from keyboards.student_keyboards import main_menu
-from utils.database import get_balance, add_points, get_all_students_rating, is_admin
+from utils.database import (
+    get_balance,
+    add_points,
+    code_lockout_left,
+    record_code_attempt,
+    get_all_students_rating,
+    get_student_neighbourhood,
+    is_admin,
+)
 from texts.storage import send_template
 
 router = Router()
 HOME_TEXT = "⬅️ На главную"
+TOP_LIMIT = 10
+NEIGHBOURHOOD_RADIUS = 2
 
 class CodeStates(StatesGroup):
     waiting_for_code = State()
@@ -67,15 +77,27 @@ async def keyboard_get_code(message: types.Message, state: FSMContext):
     )
     await state.set_state(CodeStates.waiting_for_code)
 
-@router.message(CodeStates.waiting_for_code)
-async def process_code(message: types.Message, state: FSMContext):
-    if message.text in {HOME_TEXT, ADMIN_BACK_TEXT}:
-        await go_home(message, state)
-        return
 
+def _minutes(seconds: int) -> int:
+    return max(1, (seconds + 59) // 60)
+
+
+async def redeem_and_reply(message: types.Message, code: str) -> None:
+    """Погашение кода с ответом студенту; общая точка для ввода кода и /start <код>"""
     user_id = message.from_user.id
-    code = (message.text or "").strip()
+    locked = await code_lockout_left(user_id)
+    if locked:
+        await send_template(
+            bot,
+            message,
+            "get_points_locked",
+            reply_markup=await role_main_menu(user_id),
+            minutes=_minutes(locked),
+        )
+        return
+
     points = await add_points(user_id, code)
+    locked = await record_code_attempt(user_id, bool(points))
 
     if points:
         await send_template(
@@ -86,14 +108,31 @@ async def process_code(message: types.Message, state: FSMContext):
             points=points,
             balance=await get_balance(user_id),
         )
+    elif locked:
+        await send_template(
+            bot,
+            message,
+            "get_points_locked",
+            reply_markup=await role_main_menu(user_id),
+            minutes=_minutes(locked),
+        )
     else:
         await send_template(bot, message, "get_points_fail", reply_markup=await role_main_menu(user_id))
 
+
+# Команды (в том числе /start <код> из ссылки) в ожидании кода обрабатывают свои хендлеры,
+# иначе "/start КОД" ушёл бы на погашение как код и засчитался неудачной попыткой
+@router.message(CodeStates.waiting_for_code, ~F.text.startswith("/"), flags={"throttling_key": "code"})
+async def process_code(message: types.Message, state: FSMContext):
+    if message.text in {HOME_TEXT, ADMIN_BACK_TEXT}:
+        await go_home(message, state)
+        return
+
+    await redeem_and_reply(message, (message.text or "").strip())
     await state.clear()
 
-@router.message(Command("top"))
-async def cmd_top(message: types.Message):
-    students = await get_all_students_rating(limit=10)
+async def _render_top(user_id: int) -> str:
+    students = await get_all_students_rating(limit=TOP_LIMIT)
     response = [
         "🔥 Топ студентов\n"
         "Посещай мероприятия Дней карьеры и выполняй задания от работодателей, чтобы получить больше баллов.\n"
@@ -102,20 +141,33 @@ async def cmd_top(message: types.Message):
     for idx, student in enumerate(students, 1):
         response.append(f"{idx}. {student['name']} - {student['balance']} баллов")
 
-    await message.answer("\n".join(response), reply_markup=await role_home_keyboard(message.from_user.id))
+    me = await get_student_neighbourhood(user_id, radius=NEIGHBOURHOOD_RADIUS)
+    if me is not None:
+        response.append("")
+        place = me["rank"] if me["exact"] else f"ниже {me['rank'] - 1}"
+        response.append(f"📍 Твоё место: {place} из {me['total']}")
+        if me["rank"] > TOP_LIMIT:
+            for row in me["rows"]:
+                marker = "👉 " if row["user_id"] == user_id else ""
+                num = f"{row['rank']}. " if row["rank"] is not None else ""
+                response.append(f"{marker}{num}{row['name']} - {row['balance']} баллов")
+
+    return "\n".join(response)
+
+
+@router.message(Command("top"))
+async def cmd_top(message: types.Message):
+    await message.answer(
+        await _render_top(message.from_user.id),
+        reply_markup=await role_home_keyboard(message.from_user.id),
+    )
 
 @router.message(lambda message: message.text == "🏆 Рейтинг")
 async def keyboard_top(message: types.Message):
-    students = await get_all_students_rating(limit=10)
-    response = [
-        "🔥 Топ студентов\n"
-        "Посещай мероприятия Дней карьеры и выполняй задания от работодателей, чтобы получить больше баллов.\n"
-        "Лидеры рейтинга получат особые призы от Центра развития карьеры:\n\n"
-    ]
-    for idx, student in enumerate(students, 1):
-        response.append(f"{idx}. {student['name']} - {student['balance']} баллов")
-
-    await message.answer("\n".join(response), reply_markup=await role_home_keyboard(message.from_user.id))
+    await message.answer(
+        await _render_top(message.from_user.id),
+        reply_markup=await role_home_keyboard(message.from_user.id),
+    )
 
 @router.message(lambda message: message.text == "📅 Программа")
 async def keyboard_program(message: types.Message):
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+METRICS_LOG_INTERVAL = 60.0
+
+
+class UserOrderingMiddleware(BaseMiddleware):
+    """Апдейты одного пользователя обрабатываются строго по очереди, разных — параллельно.
+
+    Регистрируется как outer-middleware на ``dp.update``. Очередь на пользователя —
+    ``asyncio.Lock`` (ожидающие будятся в порядке FIFO), общий лимит — семафор.
+    """
+
+    def __init__(self, max_concurrency: int = 64):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self._locks: dict[int, list] = {}
+        self.waiting = 0
+        self.active = 0
+        self.peak_waiting = 0
+        self._last_log = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "users": len(self._locks),
+        }
+
+    def _log_metrics(self) -> None:
+        now = time.monotonic()
+        if now - self._last_log < METRICS_LOG_INTERVAL:
+            return
+        self._last_log = now
+        logger.info(f"Update queue: {self.stats()}")
+        self.peak_waiting = self.waiting
+
+    async def __call__(self, handler, event: Update, data):
+        user = data.get("event_from_user")
+        if user is None:
+            async with self._sem:
+                return await handler(event, data)
+
+        entry = self._locks.get(user.id)
+        if entry is None:
+            entry = self._locks[user.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        started = False
+        try:
+            async with entry[0]:
+                async with self._sem:
+                    self.waiting -= 1
+                    self.active += 1
+                    started = True
+                    try:
+                        return await handler(event, data)
+                    finally:
+                        self.active -= 1
+        finally:
+            if not started:
+                self.waiting -= 1
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(user.id, None)
+            self._log_metrics()
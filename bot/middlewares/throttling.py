@@ -1,15 +1,98 @@
-import asyncio
+import hashlib
+import logging
+import time
+
 from aiogram import BaseMiddleware
-from aiogram.types import Message
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message
+from redis.asyncio.client import Redis as RedisClient
+
+logger = logging.getLogger(__name__)
+
+# Группа -> (сколько событий, за сколько секунд). Группа берётся из флага хендлера
+# ``throttling_key`` или из default_key мидлвари, подключённой к роутеру.
+THROTTLE_RULES = {
+    "default": (20, 10),
+    # Считаются только отправленные коды (не кнопка-приглашение); перебор отсекает
+    # блокировка после неудачных вводов, здесь — лишь защита от флуда на живом мероприятии.
+    "code": (12, 60),
+    "shop": (10, 5),
+    "admin": (40, 10),
+}
+
+# Одинаковые нажатия одной и той же inline-кнопки чаще этого интервала схлопываются в одно.
+CALLBACK_DEDUP_MS = 700
+
+_SLIDING_WINDOW = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+if redis.call('ZCARD', key) >= limit then
+    return 0
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return 1
+"""
+
 
 class ThrottlingMiddleware(BaseMiddleware):
-    def __init__(self, rate_limit=1):
-        self.rate_limit = rate_limit
-        self.users = {}
-
-    async def __call__(self, handler, event: Message, data):
-        user_id = event.from_user.id
-        if user_id in self.users and self.users[user_id] > asyncio.get_event_loop().time():
-            return await event.answer("❌ Слишком часто! Подождите немного.")
-        self.users[user_id] = asyncio.get_event_loop().time() + self.rate_limit
-        return await handler(event, data)
+    """Распределённый лимит частоты на Redis (скользящее окно на пользователя и группу хендлеров)."""
+
+    def __init__(self, redis: RedisClient, default_key: str = "default", rules: dict | None = None):
+        self.redis = redis
+        self.default_key = default_key
+        self.rules = rules or THROTTLE_RULES
+        self._script = redis.register_script(_SLIDING_WINDOW)
+
+    async def _allow(self, group: str, user_id: int) -> bool:
+        limit, period = self.rules.get(group, self.rules["default"])
+        now_ms = int(time.time() * 1000)
+        member = f"{now_ms}:{time.perf_counter_ns()}"
+        res = await self._script(
+            keys=[f"throttle:{group}:{user_id}"],
+            args=[now_ms, int(period * 1000), int(limit), member],
+        )
+        return bool(int(res))
+
+    async def _is_duplicate_tap(self, call: CallbackQuery) -> bool:
+        digest = hashlib.blake2s((call.data or "").encode("utf-8"), digest_size=8).hexdigest()
+        fresh = await self.redis.set(
+            f"throttle:tap:{call.from_user.id}:{digest}", 1, px=CALLBACK_DEDUP_MS, nx=True
+        )
+        return not fresh
+
+    async def _notify_once(self, group: str, user_id: int) -> bool:
+        limit, period = self.rules.get(group, self.rules["default"])
+        return bool(await self.redis.set(
+            f"throttle:notified:{group}:{user_id}", 1, ex=max(1, int(period)), nx=True
+        ))
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        group = get_flag(data, "throttling_key") or self.default_key
+        # В try только обращения к Redis: исключение хендлера не должно запускать его повторно
+        try:
+            duplicate = isinstance(event, CallbackQuery) and await self._is_duplicate_tap(event)
+            allowed = not duplicate and await self._allow(group, user.id)
+            notify = not duplicate and not allowed and await self._notify_once(group, user.id)
+        except Exception as e:
+            logger.warning(f"Throttling unavailable, passing update through: {e}")
+            duplicate, allowed = False, True
+
+        if duplicate:
+            await event.answer()
+            return None
+        if allowed:
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            await event.answer("Слишком часто! Подождите немного." if notify else None)
+        elif isinstance(event, Message) and notify:
+            await event.answer("❌ Слишком часто! Подождите немного.")
+        return None
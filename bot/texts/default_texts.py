@@ -39,6 +39,7 @@ DEFAULT_TEXTS = {
     ),
     "get_points_success": "✅ Код принят! Вам начислено {points} баллов.\nВаш баланс: {balance} баллов.",
     "get_points_fail": "❌ Ошибка! Код неверен или уже использован. Ожидаю следующей команды.",
+    "get_points_locked": "⏳ Слишком много неверных кодов подряд. Попробуй снова через {minutes} мин.",
     "spend_points_prompt": (
         "🎁 *Потратить баллы*\n\n"
         "Обменивай свои баллы на эксклюзивный мерч от работодателей на *стендовых сессиях Дней карьеры*:\n"
@@ -137,6 +138,7 @@ DEFAULT_TEXTS = {
     ),
     "get_points_success": "✅ Код принят! Вам начислено {points} баллов.\nВаш баланс: {balance} баллов.",
     "get_points_fail": "❌ Ошибка! Код неверен или уже использован. Ожидаю следующей команды.",
+    "get_points_locked": "⏳ Слишком много неверных кодов подряд. Попробуй снова через {minutes} мин.",
     "spend_points_prompt": (
         "🎁 *Потратить баллы*\n\n"
         "Обменивай свои баллы на эксклюзивный мерч от работодателей на *стендовых сессиях Дней карьеры*:\n"
@@ -170,6 +172,7 @@ DEFAULT_TEXTS = {
         "🔑 Коды мероприятий — управление кодами выбранного мероприятия:\n"
         "   • 🎲 Сгенерировать код\n"
         "   • ➕ Добавить код (баллы + тип ➕/➖ + свой код или '-' для генерации)\n"
+        "   • 📦 Пакет кодов (N одноразовых кодов + CSV)\n"
         "   • 🗑 Удалить код\n\n"
         "📜 Активные коды — список активных кодов (+ статистика использований)\n\n"
         "🛒 Товары — управление товарами:\n"
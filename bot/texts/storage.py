@@ -1,5 +1,10 @@
 import asyncio
+import functools
 import json
+import os
+import string
+import tempfile
+import time
 from pathlib import Path
 from aiogram import types
 
@@ -7,22 +12,76 @@ from texts.default_texts import DEFAULT_TEXTS
 
 _STORE_PATH = Path(__file__).resolve().parent / "store.json"
 _LOCK = asyncio.Lock()
+_store = None
+# store.json общий для всех процессов (воркеры Redis Streams, webhook): правку из одного
+# процесса остальные подхватывают по смене mtime, проверяя её не чаще раза в секунду.
+STORE_RECHECK_SECONDS = 1.0
+_store_mtime = None
+_checked_at = 0.0
 
 def _ensure_store_exists():
     if not _STORE_PATH.exists():
         _STORE_PATH.write_text(json.dumps({}, ensure_ascii=False, indent=2), encoding="utf-8")
 
-async def _read_store():
+def _load_store_sync():
     _ensure_store_exists()
+    raw = _STORE_PATH.read_text(encoding="utf-8").strip()
+    if not raw:
+        return {}
+    return json.loads(raw)
+
+def _dump_store_sync(data):
+    # Атомарная запись: временный файл рядом и os.replace поверх старого.
+    payload = json.dumps(data, ensure_ascii=False, indent=2)
+    fd, tmp_path = tempfile.mkstemp(dir=_STORE_PATH.parent, prefix=".store-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, _STORE_PATH)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _store_mtime_sync():
+    try:
+        return _STORE_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _recheck_due() -> bool:
+    return time.monotonic() - _checked_at >= STORE_RECHECK_SECONDS
+
+async def _read_store():
+    global _store, _store_mtime, _checked_at
+    if _store is not None and not _recheck_due():
+        return _store
     async with _LOCK:
-        raw = _STORE_PATH.read_text(encoding="utf-8").strip()
-        if not raw:
-            return {}
-        return json.loads(raw)
+        if _store is None or _recheck_due():
+            # mtime снимается до чтения: если файл подменят в промежутке, следующая проверка перечитает его
+            mtime = await asyncio.to_thread(_store_mtime_sync)
+            if _store is None or mtime != _store_mtime:
+                _store = await asyncio.to_thread(_load_store_sync)
+                _store_mtime = mtime
+            _checked_at = time.monotonic()
+    return _store
 
-async def _write_store(data):
+async def _update_store(key: str, **fields):
+    global _store, _store_mtime, _checked_at
     async with _LOCK:
-        _STORE_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        # Читаем с диска, а не из памяти, чтобы не затереть свежую правку другого процесса
+        new_store = dict(await asyncio.to_thread(_load_store_sync))
+        v = dict(new_store.get(key, {}))
+        v.update(fields)
+        new_store[key] = v
+        await asyncio.to_thread(_dump_store_sync, new_store)
+        _store = new_store
+        _store_mtime = await asyncio.to_thread(_store_mtime_sync)
+        _checked_at = time.monotonic()
 
 async def list_templates():
     store = await _read_store()
@@ -53,31 +112,81 @@ async def get_template(key: str):
     }
 
 async def set_text(key: str, text: str):
-    store = await _read_store()
-    v = store.get(key, {})
-    v["text"] = text
-    store[key] = v
-    await _write_store(store)
+    await _update_store(key, text=text)
 
 async def set_photo(key: str, file_id: str):
-    store = await _read_store()
-    v = store.get(key, {})
-    v["photo"] = file_id
-    store[key] = v
-    await _write_store(store)
+    await _update_store(key, photo=file_id)
 
 async def clear_photo(key: str):
-    store = await _read_store()
-    v = store.get(key, {})
-    v["photo"] = None
-    store[key] = v
-    await _write_store(store)
+    await _update_store(key, photo=None)
+
+_FORMATTER = string.Formatter()
+
+
+class CompiledTemplate:
+    """Разобранный один раз шаблон: литералы и плейсхолдеры в порядке следования."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.error = None
+        self.parts = ()
+        self.fields = frozenset()
+        try:
+            self.parts = tuple(_FORMATTER.parse(source))
+            self.fields = frozenset(
+                _field_root(name) for _, name, _, _ in self.parts if name is not None
+            )
+        except ValueError as e:
+            self.error = str(e)
+
+    def fill(self, **kwargs) -> str:
+        if self.error is not None:
+            return self.source
+        if not self.fields:
+            return "".join(literal for literal, _, _, _ in self.parts)
+        out = []
+        try:
+            for literal, name, spec, conversion in self.parts:
+                out.append(literal)
+                if name is None:
+                    continue
+                value, _ = _FORMATTER.get_field(name, (), kwargs)
+                value = _FORMATTER.convert_field(value, conversion)
+                out.append(_FORMATTER.format_field(value, spec or ""))
+        except Exception:
+            return self.source
+        return "".join(out)
+
+
+def _field_root(name: str) -> str:
+    for i, ch in enumerate(name):
+        if ch in ".[":
+            return name[:i]
+    return name
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(text: str) -> CompiledTemplate:
+    return CompiledTemplate(text)
+
+
+def validate_template(key: str, text: str):
+    """Проверка шаблона при редактировании. Возвращает текст ошибки или None."""
+    compiled = CompiledTemplate(text)
+    if compiled.error is not None:
+        return f"Ошибка в фигурных скобках: {compiled.error}. Одиночные скобки пишите как {{{{ и }}}}."
+
+    allowed = compile_template(DEFAULT_TEXTS.get(key, "")).fields
+    unknown = sorted(f for f in compiled.fields if f not in allowed)
+    if unknown:
+        known = ", ".join("{" + f + "}" for f in sorted(allowed)) or "нет"
+        bad = ", ".join("{" + f + "}" for f in unknown)
+        return f"Неизвестные плейсхолдеры: {bad}. Доступные для этого шаблона: {known}."
+    return None
+
 
 def render(text: str, **kwargs):
-    try:
-        return text.format(**kwargs)
-    except Exception:
-        return text
+    return compile_template(text).fill(**kwargs)
 
 async def send_template(bot, message: types.Message, key: str, reply_markup=None, parse_mode=None, disable_web_page_preview=None, **kwargs):
     tpl = await get_template(key)
@@ -5,7 +5,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from keyboards.organizer_keyboards import organizer_menu, ADMIN_PANEL_TEXT
 from utils.database import is_admin
-from texts.storage import list_templates, get_template, set_text, set_photo, clear_photo
+from texts.storage import list_templates, get_template, set_text, set_photo, clear_photo, validate_template
 
 router = Router()
 
@@ -89,6 +89,10 @@ async def save_new_text(message: types.Message, state: FSMContext):
     if not key:
         await state.clear()
         return
+    error = validate_template(key, message.text or "")
+    if error:
+        await message.answer(f"❌ Шаблон не сохранён.\n{error}\n\nПришли исправленный текст.")
+        return
     await set_text(key, message.text or "")
     tpl = await get_template(key)
     text = tpl["text"] or ""
@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+
+from utils.config import BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_STALE_SECONDS
+from utils.database import get_db, get_redis
+from utils.redis_lease import RedisLease
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = 200
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+PROGRESS_INTERVAL = 5.0
+IDLE_POLL_SECONDS = 5.0
+# Рассылки ведёт один процесс: лимит Telegram общий на бота, а TokenBucket — локальный.
+LEADER_KEY = "broadcast:leader"
+LEADER_TTL_MS = 30_000
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+class TokenBucket:
+    """Ограничитель скорости: не больше ``rate`` отправок в секунду с запасом ``capacity``."""
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        self.rate = max(0.1, float(rate))
+        self.capacity = float(capacity or max(1, int(self.rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def pause(self, seconds: float) -> None:
+        """Глобальная пауза после retry_after: вычерпываем бакет и ждём под замком."""
+        async with self._lock:
+            self._tokens = 0
+            await asyncio.sleep(seconds)
+            self._updated = time.monotonic()
+
+
+async def deliver(bot: Bot, bucket: TokenBucket, user_id: int, text: str) -> tuple[bool, Optional[str]]:
+    error = None
+    for attempt in range(MAX_ATTEMPTS):
+        await bucket.acquire()
+        try:
+            await bot.send_message(user_id, text)
+            return True, None
+        except TelegramRetryAfter as e:
+            logger.warning(f"Broadcast flood control, retry after {e.retry_after}s")
+            await bucket.pause(float(e.retry_after))
+            error = str(e)
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            logger.info(f"Broadcast skipped {user_id}: {e}")
+            return False, str(e)
+        except Exception as e:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+            logger.warning(f"Broadcast to {user_id} failed (attempt {attempt + 1}): {e}; retry in {delay}s")
+            await asyncio.sleep(delay)
+            error = str(e)
+    logger.error(f"Broadcast to {user_id} gave up after {MAX_ATTEMPTS} attempts")
+    return False, error
+
+
+def render_progress(stats: dict) -> str:
+    head = "✅ Уведомление отправлено." if stats.get("done") else "⏳ Рассылка идёт…"
+    processed = int(stats.get("sent", 0)) + int(stats.get("failed", 0))
+    return (
+        f"{head}\n\n"
+        f"📨 Обработано: {processed}/{stats.get('total', 0)}\n"
+        f"✅ Доставлено: {stats.get('sent', 0)}\n"
+        f"❌ Не доставлено: {stats.get('failed', 0)}"
+    )
+
+
+async def enqueue_broadcast(
+    text: str,
+    created_by: Optional[int] = None,
+    progress_chat_id: Optional[int] = None,
+    progress_message_id: Optional[int] = None,
+) -> int:
+    """Создание задания рассылки: список получателей фиксируется в той же транзакции."""
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            job_id = await conn.fetchval(
+                """
+                INSERT INTO broadcast_jobs (text, created_by, progress_chat_id, progress_message_id)
+                VALUES ($1, $2, $3, $4)
+                RETURNING id
+                """,
+                text, created_by, progress_chat_id, progress_message_id
+            )
+            await conn.execute(
+                """
+                INSERT INTO broadcast_deliveries (job_id, user_id)
+                SELECT $1, id FROM students
+                """,
+                job_id
+            )
+            await conn.execute(
+                """
+                UPDATE broadcast_jobs
+                SET total = (SELECT COUNT(*) FROM broadcast_deliveries WHERE job_id = $1)
+                WHERE id = $1
+                """,
+                job_id
+            )
+
+    if _wakeup is not None:
+        _wakeup.set()
+    return int(job_id)
+
+
+async def _requeue_stale_deliveries() -> None:
+    """Возврат в очередь доставок, брошенных прежним исполнителем посреди отправки.
+    Вызывается только при старте или смене ведущего, иначе медленная отправка
+    этого же процесса ушла бы повторно."""
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        n = await conn.execute(
+            """
+            UPDATE broadcast_deliveries
+            SET status = 'PENDING'
+            WHERE status = 'SENDING'
+              AND (updated_at IS NULL OR updated_at < NOW() - $1 * INTERVAL '1 second')
+            """,
+            BROADCAST_STALE_SECONDS
+        )
+        if n and n != "UPDATE 0":
+            logger.info(f"Broadcast deliveries requeued: {n}")
+
+
+async def _finish_drained_jobs() -> list:
+    """Закрывает незавершённые задания, в которых не осталось доставок в работе."""
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        return await conn.fetch(
+            """
+            UPDATE broadcast_jobs j
+            SET status = 'DONE', finished_at = NOW()
+            WHERE j.status IN ('PENDING', 'RUNNING')
+              AND NOT EXISTS (
+                  SELECT 1 FROM broadcast_deliveries d
+                  WHERE d.job_id = j.id AND d.status IN ('PENDING', 'SENDING')
+              )
+            RETURNING id, text, total, progress_chat_id, progress_message_id
+            """
+        )
+
+
+async def _next_job():
+    """Самое раннее задание, в котором есть что забрать; задание с одними SENDING не блокирует следующие."""
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        return await conn.fetchrow(
+            """
+            SELECT j.id, j.text, j.total, j.progress_chat_id, j.progress_message_id
+            FROM broadcast_jobs j
+            WHERE j.status IN ('PENDING', 'RUNNING')
+              AND EXISTS (
+                  SELECT 1 FROM broadcast_deliveries d
+                  WHERE d.job_id = j.id AND d.status = 'PENDING'
+              )
+            ORDER BY j.id ASC
+            LIMIT 1
+            """
+        )
+
+
+async def _claim_batch(job_id: int) -> list[int]:
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "UPDATE broadcast_jobs SET status = 'RUNNING' WHERE id = $1 AND status = 'PENDING'",
+                job_id
+            )
+            rows = await conn.fetch(
+                """
+                UPDATE broadcast_deliveries d
+                SET status = 'SENDING', updated_at = NOW()
+                FROM (
+                    SELECT job_id, user_id
+                    FROM broadcast_deliveries
+                    WHERE job_id = $1 AND status = 'PENDING'
+                    ORDER BY user_id ASC
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                ) picked
+                WHERE d.job_id = picked.job_id AND d.user_id = picked.user_id
+                RETURNING d.user_id
+                """,
+                job_id, CLAIM_BATCH_SIZE
+            )
+    return [int(r["user_id"]) for r in rows]
+
+
+async def _record_delivery(job_id: int, user_id: int, ok: bool, error: Optional[str]) -> None:
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            UPDATE broadcast_deliveries
+            SET status = $3, error = $4, attempts = attempts + 1, updated_at = NOW()
+            WHERE job_id = $1 AND user_id = $2
+            """,
+            job_id, user_id, "SENT" if ok else "FAILED", error
+        )
+
+
+async def _job_stats(job_id: int) -> dict:
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT
+                COUNT(*) AS total,
+                COUNT(*) FILTER (WHERE status = 'SENT') AS sent,
+                COUNT(*) FILTER (WHERE status = 'FAILED') AS failed,
+                COUNT(*) FILTER (WHERE status IN ('PENDING', 'SENDING')) AS left
+            FROM broadcast_deliveries
+            WHERE job_id = $1
+            """,
+            job_id
+        )
+    return {
+        "total": int(row["total"]),
+        "sent": int(row["sent"]),
+        "failed": int(row["failed"]),
+        "left": int(row["left"]),
+        "done": int(row["left"]) == 0,
+    }
+
+
+async def _finish_job(job_id: int) -> bool:
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        n = await conn.execute(
+            """
+            UPDATE broadcast_jobs
+            SET status = 'DONE', finished_at = NOW()
+            WHERE id = $1
+              AND status <> 'DONE'
+              AND NOT EXISTS (
+                  SELECT 1 FROM broadcast_deliveries
+                  WHERE job_id = $1 AND status IN ('PENDING', 'SENDING')
+              )
+            """,
+            job_id
+        )
+    return n == "UPDATE 1"
+
+
+async def _report_progress(bot: Bot, job, stats: dict) -> None:
+    if not job["progress_chat_id"] or not job["progress_message_id"]:
+        return
+    try:
+        await bot.edit_message_text(
+            render_progress(stats),
+            chat_id=int(job["progress_chat_id"]),
+            message_id=int(job["progress_message_id"]),
+        )
+    except Exception as e:
+        logger.debug(f"Broadcast progress update skipped: {e}")
+
+
+async def _run_job(bot: Bot, bucket: TokenBucket, job, lease: Optional[RedisLease] = None) -> int:
+    job_id = int(job["id"])
+    text = job["text"]
+    sem = asyncio.Semaphore(max(1, BROADCAST_CONCURRENCY))
+    last_report = 0.0
+    processed = 0
+
+    async def send_one(user_id: int):
+        async with sem:
+            ok, error = await deliver(bot, bucket, user_id, text)
+            await _record_delivery(job_id, user_id, ok, error)
+
+    while lease is None or lease.held:
+        batch = await _claim_batch(job_id)
+        if not batch:
+            break
+        await asyncio.gather(*(send_one(uid) for uid in batch), return_exceptions=True)
+        processed += len(batch)
+
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            await _report_progress(bot, job, await _job_stats(job_id))
+
+    if await _finish_job(job_id):
+        stats = await _job_stats(job_id)
+        logger.info(f"Broadcast job {job_id} finished: {stats}")
+        await _report_progress(bot, job, stats)
+    return processed
+
+
+async def broadcast_worker_loop(bot: Optional[Bot] = None):
+    """Фоновый обработчик очереди рассылок; после рестарта продолжает незавершённые задания."""
+    global _wakeup
+    if bot is None:
+        from core.bot import bot as default_bot
+        bot = default_bot
+
+    _wakeup = asyncio.Event()
+    bucket = TokenBucket(BROADCAST_RATE)
+    redis = get_redis()
+    lease = RedisLease(redis, LEADER_KEY, LEADER_TTL_MS) if redis is not None else None
+    requeued = False
+
+    while True:
+        try:
+            taking_over = lease is not None and not lease.held
+            # Без Redis (один процесс) аренда не нужна
+            if lease is None or await lease.acquire():
+                if taking_over or not requeued:
+                    await _requeue_stale_deliveries()
+                    requeued = True
+                for done in await _finish_drained_jobs():
+                    stats = await _job_stats(int(done["id"]))
+                    logger.info(f"Broadcast job {done['id']} finished: {stats}")
+                    await _report_progress(bot, done, stats)
+                job = await _next_job()
+                if job is not None and await _run_job(bot, bucket, job, lease):
+                    continue
+        except Exception as e:
+            logger.exception(f"broadcast_worker_loop error: {e}")
+
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=IDLE_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
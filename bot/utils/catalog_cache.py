@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class CatalogCache:
+    """Кэш каталога в памяти процесса с single-flight загрузкой.
+
+    Параллельные промахи ждут одну и ту же загрузку из БД; ``invalidate``
+    сбрасывает кэш, и результат уже начатой загрузки не сохраняется.
+    ``shared_version`` — общий для процессов счётчик правок: если он сменился,
+    кэш сбрасывается (проверка не чаще раза в ``recheck_seconds``).
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[list[dict]]],
+        ttl_seconds: float = 30.0,
+        shared_version: Optional[Callable[[], Awaitable[Optional[int]]]] = None,
+        recheck_seconds: float = 1.0,
+    ):
+        self._loader = loader
+        self._ttl = float(ttl_seconds)
+        self._shared_version = shared_version
+        self._recheck = float(recheck_seconds)
+        self._seen_shared: Optional[int] = None
+        self._checked_at = 0.0
+        self._items: Optional[list[dict]] = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._inflight: Optional[asyncio.Task] = None
+
+    async def _check_shared(self) -> None:
+        now = time.monotonic()
+        if self._shared_version is None or now - self._checked_at < self._recheck:
+            return
+        self._checked_at = now
+        version = await self._shared_version()
+        if version is not None and version != self._seen_shared:
+            self._seen_shared = version
+            self.invalidate()
+
+    async def get(self) -> list[dict]:
+        await self._check_shared()
+        if self._items is not None and time.monotonic() - self._loaded_at < self._ttl:
+            return self._items
+
+        task = self._inflight
+        if task is None:
+            task = asyncio.ensure_future(self._load(self._version))
+            self._inflight = task
+        return await asyncio.shield(task)
+
+    async def _load(self, version: int) -> list[dict]:
+        try:
+            items = await self._loader()
+            if version == self._version:
+                self._items = items
+                self._loaded_at = time.monotonic()
+            return items
+        finally:
+            if self._inflight is asyncio.current_task():
+                self._inflight = None
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._items = None
+        self._inflight = None
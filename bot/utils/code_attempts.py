@@ -0,0 +1,81 @@
+from redis.asyncio.client import Redis as RedisClient
+
+
+# Сколько неудачных вводов подряд допускается до блокировки
+MAX_FAILURES = 5
+# Окно, в котором копятся неудачные попытки
+FAILURE_WINDOW = 600
+# Первая блокировка; каждая следующая вдвое длиннее
+BASE_LOCKOUT = 60
+MAX_LOCKOUT = 3600
+# Сколько помним прошлые блокировки (для экспоненты)
+STRIKES_TTL = 86400
+
+
+# KEYS: fail, lock, strikes
+# ARGV: window, max_failures, base, max_lockout, strikes_ttl
+_REGISTER_FAILURE_LUA = """
+local fails = redis.call('INCR', KEYS[1])
+if fails == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if fails < tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+local strikes = redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[5])
+local lock = tonumber(ARGV[3]) * 2 ^ (strikes - 1)
+if lock > tonumber(ARGV[4]) then
+    lock = tonumber(ARGV[4])
+end
+lock = math.floor(lock)
+redis.call('SET', KEYS[2], strikes, 'EX', lock)
+return lock
+"""
+
+
+class CodeAttemptLimiter:
+    """Ограничение перебора кодов: счётчик ошибок и экспоненциальная блокировка в Redis."""
+
+    def __init__(
+        self,
+        redis: RedisClient,
+        max_failures: int = MAX_FAILURES,
+        window: int = FAILURE_WINDOW,
+        base_lockout: int = BASE_LOCKOUT,
+        max_lockout: int = MAX_LOCKOUT,
+    ):
+        self.redis = redis
+        self.max_failures = max_failures
+        self.window = window
+        self.base_lockout = base_lockout
+        self.max_lockout = max_lockout
+        self._register = redis.register_script(_REGISTER_FAILURE_LUA)
+
+    @staticmethod
+    def _keys(user_id: int):
+        return (
+            f"code:fail:{user_id}",
+            f"code:lock:{user_id}",
+            f"code:strikes:{user_id}",
+        )
+
+    async def lockout_left(self, user_id: int) -> int:
+        """Сколько секунд осталось до снятия блокировки (0 — не заблокирован)."""
+        ms = await self.redis.pttl(self._keys(user_id)[1])
+        if ms is None or ms <= 0:
+            return 0
+        return (int(ms) + 999) // 1000
+
+    async def register_failure(self, user_id: int) -> int:
+        """Учесть неудачный ввод. Возвращает длительность новой блокировки или 0."""
+        lock = await self._register(
+            keys=list(self._keys(user_id)),
+            args=[self.window, self.max_failures, self.base_lockout, self.max_lockout, STRIKES_TTL],
+        )
+        return int(lock or 0)
+
+    async def register_success(self, user_id: int) -> None:
+        # Прошлые блокировки не сбрасываем: один верный код не должен обнулять экспоненту.
+        await self.redis.delete(self._keys(user_id)[0])
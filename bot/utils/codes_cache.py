@@ -4,6 +4,16 @@ from redis.asyncio import Redis
 from redis.asyncio.client import Redis as RedisClient
 
 
+# Статусы, при которых код можно отклонить прямо из кэша, не трогая БД.
+REJECT_STATUSES = frozenset({"pending", "expired", "exhausted", "unknown"})
+
+UNKNOWN_TTL = 30
+EXPIRED_TTL = 3600
+# Слот кода освобождается при удалении студента (триггер на user_codes), поэтому
+# «исчерпан» держим недолго, а не до expires_at
+EXHAUSTED_TTL = 60
+
+
 class CodesCache:
     def __init__(self, redis: RedisClient):
         self.redis = redis
@@ -24,6 +34,16 @@ class CodesCache:
         ttl = max(1, int(ttl_seconds))
         await self.redis.set(self._key(code), status, ex=ttl)
 
+    async def set_many(self, items) -> None:
+        """Пакетная запись статусов: items — итерируемое (code, status, ttl_seconds)."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for code, status, ttl_seconds in items:
+                pipe.set(self._key(code), status, ex=max(1, int(ttl_seconds)))
+            await pipe.execute()
+
+    async def is_rejected(self, code: str) -> bool:
+        return await self.get_status(code) in REJECT_STATUSES
+
 
 def ttl_until(ts_now, ts_target) -> int:
     if ts_target is None:
@@ -37,4 +57,16 @@ def compute_status(now, starts_at, expires_at) -> str:
         return "pending"
     if expires_at is not None and now >= expires_at:
         return "expired"
-    return "active"
\ No newline at end of file
+    return "active"
+
+
+def status_ttl(now, status: str, starts_at, expires_at) -> int:
+    if status == "pending":
+        return ttl_until(now, starts_at)
+    if status == "expired":
+        return EXPIRED_TTL
+    if status == "unknown":
+        return UNKNOWN_TTL
+    if status == "exhausted":
+        return min(EXHAUSTED_TTL, ttl_until(now, expires_at)) if expires_at is not None else EXHAUSTED_TTL
+    return ttl_until(now, expires_at) if expires_at is not None else 60
@@ -19,3 +19,25 @@ TOKEN = os.getenv("BOT_TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL")
 REDIS_URL = _normalize_redis_url(os.getenv("REDIS_URL"))
 TELEGRAM_PROXY_URL = os.getenv("TELEGRAM_PROXY_URL")
+
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "8"))
+# Через сколько секунд доставка в SENDING считается брошенной упавшим процессом
+BROADCAST_STALE_SECONDS = int(os.getenv("BROADCAST_STALE_SECONDS", "300"))
+
+# Режим получения апдейтов: "polling" (по умолчанию) или "webhook"
+BOT_MODE = (os.getenv("BOT_MODE") or "polling").strip().lower()
+WEBHOOK_BASE_URL = (os.getenv("WEBHOOK_BASE_URL") or "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+
+# Масштабирование через Redis Streams: при UPDATE_PARTITIONS > 0 режимы polling/webhook
+# работают как ingress и только складывают апдейты в поток, а BOT_MODE=worker их обрабатывает.
+UPDATE_PARTITIONS = int(os.getenv("UPDATE_PARTITIONS", "0"))
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "1"))
+
+# Глобальный лимит одновременно обрабатываемых апдейтов (апдейты одного пользователя идут строго по очереди)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
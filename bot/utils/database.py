@@ -1,14 +1,22 @@
+import asyncio
 import asyncpg
 from asyncpg.pool import Pool
 from typing import Optional, List, Dict, Union
 from utils.config import DATABASE_URL
 import logging
+import secrets
+import string
+import time
 
 
 from datetime import datetime, timezone
 from utils.config import REDIS_URL
 from redis.asyncio import Redis
-from utils.codes_cache import CodesCache, compute_status, ttl_until
+from utils.codes_cache import CodesCache, compute_status, status_ttl
+from utils.leaderboard import Leaderboard
+from utils.redis_lease import RedisLease
+from utils.code_attempts import CodeAttemptLimiter
+from utils.expiry_schedule import ExpirySchedule, expiry_wakeup
 
 
 # Настройка логгера
@@ -18,82 +26,274 @@ logger = logging.getLogger(__name__)
 _pool: Optional[Pool] = None
 _redis: Optional[Redis] = None
 _codes_cache: Optional[CodesCache] = None
+_leaderboard: Optional[Leaderboard] = None
+_code_attempts: Optional[CodeAttemptLimiter] = None
+_expiry_schedule: Optional[ExpirySchedule] = None
+
+# Кэш ролей: user_id -> (is_admin, monotonic deadline)
+ADMIN_CACHE_TTL = 60.0
+ADMIN_CACHE_MAX_SIZE = 10000
+_admin_cache: Dict[int, tuple] = {}
 
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
-async def redeem_code(user_id: int, code: str) -> Optional[int]:
-    pool = await get_db()
-    code_u = code.upper()
-    now = _utcnow()
+async def _cache_code_status(code: str, status: str, ttl: int) -> None:
+    if _codes_cache is None:
+        return
+    try:
+        await _codes_cache.set_status(code, status, ttl)
+    except Exception as e:
+        logger.warning(f"Failed to cache status for code {code}: {e}")
 
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            row = await conn.fetchrow(
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+async def bump_catalog_version() -> None:
+    """Сообщает остальным процессам, что каталог изменился"""
+    if _redis is None:
+        return
+    try:
+        await _redis.incr(CATALOG_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to publish catalog version: {e}")
+
+
+async def get_catalog_version() -> Optional[int]:
+    if _redis is None:
+        return None
+    try:
+        v = await _redis.get(CATALOG_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to read catalog version: {e}")
+        return None
+    return int(v or 0)
+
+
+async def sync_leaderboard(user_id: int, balance: int, version: int) -> None:
+    """Перенос баланса в рейтинг Redis; version — id записи points_ledger из той же транзакции.
+    Ошибки Redis не ломают операцию: значение поправит следующее изменение или сверка."""
+    if _leaderboard is None or balance is None or version is None:
+        return
+    try:
+        await _leaderboard.set_balance(user_id, int(balance), int(version))
+    except Exception as e:
+        logger.warning(f"Failed to update leaderboard for {user_id}: {e}")
+
+
+async def add_leaderboard_member(user_id: int, name: str) -> None:
+    if _leaderboard is None:
+        return
+    try:
+        await _leaderboard.add_member(user_id, name)
+    except Exception as e:
+        logger.warning(f"Failed to add {user_id} to leaderboard: {e}")
+
+
+async def code_lockout_left(user_id: int) -> int:
+    """Сколько секунд студенту запрещено вводить коды (без обращения к Postgres)"""
+    if _code_attempts is None:
+        return 0
+    try:
+        return await _code_attempts.lockout_left(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to check code lockout for {user_id}: {e}")
+        return 0
+
+
+async def record_code_attempt(user_id: int, success: bool) -> int:
+    """Учёт результата ввода кода. Возвращает длительность новой блокировки или 0"""
+    if _code_attempts is None:
+        return 0
+    try:
+        if success:
+            await _code_attempts.register_success(user_id)
+            return 0
+        return await _code_attempts.register_failure(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to record code attempt for {user_id}: {e}")
+        return 0
+
+
+def get_redis() -> Optional[Redis]:
+    return _redis
+
+
+def get_expiry_schedule() -> Optional[ExpirySchedule]:
+    return _expiry_schedule
+
+
+async def schedule_order_expiry(order_id: int, deadline: datetime) -> None:
+    """Постановка дедлайна резерва в расписание (ошибки Redis подберёт периодическая сверка)"""
+    if _expiry_schedule is None or deadline is None:
+        return
+    try:
+        await _expiry_schedule.add(order_id, deadline)
+    except Exception as e:
+        logger.warning(f"Failed to schedule expiry for order {order_id}: {e}")
+        return
+    expiry_wakeup.set()
+
+
+async def unschedule_order_expiry(order_ids: List[int]) -> None:
+    if _expiry_schedule is None:
+        return
+    try:
+        await _expiry_schedule.remove(order_ids)
+    except Exception as e:
+        logger.warning(f"Failed to unschedule expiry for orders {order_ids}: {e}")
+
+
+LEADERBOARD_RECONCILE_KEY = "leaderboard:reconcile"
+LEADERBOARD_RECONCILE_INTERVAL = 600
+
+
+async def reconcile_leaderboard() -> None:
+    """Сверка рейтинга в Redis с students.balance. Выполняет один процесс за раз."""
+    if _leaderboard is None:
+        return
+    lease = RedisLease(_redis, LEADERBOARD_RECONCILE_KEY, 60_000)
+    if not await lease.acquire():
+        return
+    try:
+        pool = await get_db()
+        async with pool.acquire() as conn:
+            # Баланс и версия из одного снимка
+            rows = await conn.fetch(
+                """
+                SELECT s.id, s.name, s.balance,
+                       COALESCE((SELECT MAX(pl.id) FROM points_ledger pl WHERE pl.user_id = s.id), 0) AS version
+                FROM students s
                 """
-                SELECT id, points, is_income, starts_at, expires_at, max_uses
-                FROM codes
-                WHERE code = $1
-                FOR UPDATE
-                """,
-                code_u
             )
-            if not row:
-                return None
-            
-            if not row["is_income"]:
-                return None
+            n = await _leaderboard.reconcile(rows)
+            missing = await _leaderboard.members_missing_from(r["id"] for r in rows)
+            if missing:
+                # Перепроверка: студент мог зарегистрироваться уже после снимка
+                still = await conn.fetch(
+                    "SELECT id FROM students WHERE id = ANY($1::bigint[])",
+                    missing
+                )
+                present = {int(r["id"]) for r in still}
+                missing = [x for x in missing if x not in present]
+                await _leaderboard.remove(missing)
+        logger.info(f"Leaderboard reconciled: {n} students, {len(missing)} removed")
+    finally:
+        await lease.release()
+
+
+async def leaderboard_reconcile_loop():
+    """Периодическая сверка рейтинга: чинит записи, потерянные при сбоях Redis после коммита."""
+    while True:
+        await asyncio.sleep(LEADERBOARD_RECONCILE_INTERVAL)
+        try:
+            await reconcile_leaderboard()
+        except Exception as e:
+            logger.warning(f"Leaderboard reconcile failed: {e}")
 
-            starts_at = row["starts_at"]
-            expires_at = row["expires_at"]
-            max_uses = row["max_uses"]
 
-            if starts_at is not None and now < starts_at:
-                return None
-            if expires_at is not None and now >= expires_at:
-                return None
+async def _code_rejected_by_cache(code: str) -> bool:
+    if _codes_cache is None:
+        return False
+    try:
+        return await _codes_cache.is_rejected(code)
+    except Exception as e:
+        logger.warning(f"Codes cache lookup failed for {code}: {e}")
+        return False
+
+
+_REDEEM_SQL = """
+WITH target AS (
+    SELECT id, points, is_income, starts_at, expires_at, max_uses, uses_count
+    FROM codes
+    WHERE code = $2
+),
+bumped AS (
+    UPDATE codes c
+    SET uses_count = c.uses_count + 1
+    FROM target t
+    WHERE c.id = t.id
+      AND c.is_income
+      AND (c.starts_at IS NULL OR c.starts_at <= $3)
+      AND (c.expires_at IS NULL OR c.expires_at > $3)
+      AND (c.max_uses IS NULL OR c.uses_count < c.max_uses)
+      AND NOT EXISTS (
+          SELECT 1 FROM user_codes uc
+          WHERE uc.user_id = $1 AND uc.code_id = c.id
+      )
+    RETURNING c.id, c.points, c.uses_count
+),
+claimed AS (
+    INSERT INTO user_codes (user_id, code_id)
+    SELECT $1, id FROM bumped
+    RETURNING code_id
+),
+credited AS (
+    UPDATE students s
+    SET balance = s.balance + b.points
+    FROM bumped b
+    WHERE s.id = $1
+    RETURNING s.balance
+),
+booked AS (
+    INSERT INTO points_ledger (user_id, delta, reason, code_id)
+    SELECT $1, b.points, 'code', b.id
+    FROM bumped b
+    WHERE EXISTS (SELECT 1 FROM credited)
+    RETURNING id
+)
+SELECT t.id, t.points, t.is_income, t.starts_at, t.expires_at, t.max_uses,
+       t.uses_count,
+       b.uses_count AS uses_after,
+       (SELECT balance FROM credited) AS balance,
+       (SELECT id FROM booked) AS ledger_id
+FROM target t
+LEFT JOIN bumped b ON b.id = t.id
+"""
 
-            used = await conn.fetchval(
-                "SELECT 1 FROM user_codes WHERE user_id = $1 AND code_id = $2",
-                user_id, row["id"]
-            )
-            if used:
-                return None
 
-            if max_uses is not None:
-                used_total = await conn.fetchval(
-                    "SELECT COUNT(*) FROM user_codes WHERE code_id = $1",
-                    row["id"]
-                )
-                if int(used_total) >= int(max_uses):
-                    return None
+async def redeem_code(user_id: int, code: str) -> Optional[int]:
+    """Атомарное погашение кода одним запросом (без долгой блокировки строки кода)"""
+    code_u = code.upper()
+    if await _code_rejected_by_cache(code_u):
+        return None
 
-            delta = int(row["points"])
-            await conn.execute(
-                "UPDATE students SET balance = balance + $1 WHERE id = $2",
-                delta, user_id
-            )
-            await conn.execute(
-                "INSERT INTO user_codes (user_id, code_id) VALUES ($1, $2)",
-                user_id, row["id"]
-            )
+    pool = await get_db()
+    now = _utcnow()
 
-    if _codes_cache is not None:
-        try:
-            status = compute_status(now, starts_at, expires_at)
-            if status == "pending":
-                ttl = ttl_until(now, starts_at)
-            elif status == "expired":
-                ttl = 3600
-            else:
-                ttl = ttl_until(now, expires_at) if expires_at is not None else 60
-            await _codes_cache.set_status(code_u, status, ttl)
-        except Exception:
-            pass
+    try:
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(_REDEEM_SQL, user_id, code_u, now)
+    except asyncpg.UniqueViolationError:
+        # Параллельное повторное погашение тем же пользователем: весь оператор
+        # откатился вместе с инкрементом счётчика.
+        return None
+
+    if not row or not row["is_income"]:
+        await _cache_code_status(code_u, "unknown", status_ttl(now, "unknown", None, None))
+        return None
+
+    starts_at = row["starts_at"]
+    expires_at = row["expires_at"]
+    max_uses = row["max_uses"]
+    status = compute_status(now, starts_at, expires_at)
+
+    if row["uses_after"] is None:
+        if status == "active" and max_uses is not None and int(row["uses_count"]) >= int(max_uses):
+            status = "exhausted"
+        if status != "active":
+            await _cache_code_status(code_u, status, status_ttl(now, status, starts_at, expires_at))
+        return None
+
+    if max_uses is not None and int(row["uses_after"]) >= int(max_uses):
+        status = "exhausted"
+    await _cache_code_status(code_u, status, status_ttl(now, status, starts_at, expires_at))
+    await sync_leaderboard(user_id, row["balance"], row["ledger_id"])
 
-    return delta
+    return int(row["points"])
 
 
 async def init_db():
@@ -115,9 +315,17 @@ async def init_db():
         )
         logger.info("Connection pool initialized")
 
-        global _redis, _codes_cache
+        global _redis, _codes_cache, _leaderboard, _code_attempts, _expiry_schedule
         _redis = Redis.from_url(REDIS_URL, decode_responses=False)
         _codes_cache = CodesCache(_redis)
+        _leaderboard = Leaderboard(_redis)
+        _code_attempts = CodeAttemptLimiter(_redis)
+        _expiry_schedule = ExpirySchedule(_redis)
+        try:
+            await reconcile_leaderboard()
+        except Exception as e:
+            logger.warning(f"Leaderboard reconcile failed, rating falls back to Postgres: {e}")
+            _leaderboard = None
         logger.info("Database startup checks completed without schema changes")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
@@ -136,11 +344,14 @@ async def close_db():
         await _pool.close()
         _pool = None
         logger.info("Connection pool closed")
-    global _redis, _codes_cache
+    global _redis, _codes_cache, _leaderboard, _code_attempts, _expiry_schedule
     if _redis:
         await _redis.close()
         _redis = None
         _codes_cache = None
+        _leaderboard = None
+        _code_attempts = None
+        _expiry_schedule = None
 
 
 async def register_student(user_id: int, name: str, telegram_username: str = None, course: str = None, faculty: str = None) -> bool:
@@ -170,7 +381,9 @@ async def register_student(user_id: int, name: str, telegram_username: str = Non
                 course, 
                 faculty  # Теперь параметры совпадают с порядком в запросе
             )
-            return True
+
+    await add_leaderboard_member(user_id, name)
+    return True
 
 
 async def get_balance(user_id: int) -> int:
@@ -202,46 +415,155 @@ async def add_admin(user_id: int):
                 ON CONFLICT (user_id) DO NOTHING""",
                 user_id
             )
+    _admin_cache.pop(user_id, None)
 
 async def is_admin(user_id: int) -> bool:
-    """Проверка прав администратора"""
+    """Проверка прав администратора (с кэшем в памяти процесса)"""
+    cached = _admin_cache.get(user_id)
+    now = time.monotonic()
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
     pool = await get_db()
     async with pool.acquire() as conn:
-        return await conn.fetchval(
+        result = await conn.fetchval(
             "SELECT 1 FROM admins WHERE user_id = $1",
             user_id
         ) is not None
 
-async def send_notification(text: str):
-    """Отправка уведомлений всем студентам"""
-    from core.bot import bot
-    pool = await get_db()
-    async with pool.acquire() as conn:
-        students = await conn.fetch("SELECT id FROM students")
-        for student in students:
-            try:
-                await bot.send_message(student['id'], text)
-            except Exception as e:
-                logger.error(f"Failed to send message to {student['id']}: {e}")
+    if len(_admin_cache) >= ADMIN_CACHE_MAX_SIZE:
+        _admin_cache.clear()
+    _admin_cache[user_id] = (result, now + ADMIN_CACHE_TTL)
+    return result
+
+async def send_notification(
+    text: str,
+    created_by: Optional[int] = None,
+    progress_chat_id: Optional[int] = None,
+    progress_message_id: Optional[int] = None,
+) -> int:
+    """Постановка уведомления всем студентам в очередь рассылок"""
+    from utils.broadcast import enqueue_broadcast
+    return await enqueue_broadcast(text, created_by, progress_chat_id, progress_message_id)
 
 async def get_all_students_rating(limit: int | None = 10) -> List[Dict]:
     """Рейтинг студентов. Если limit=None, возвращает весь список."""
+    if _leaderboard is not None:
+        try:
+            return await _leaderboard.top(limit)
+        except Exception as e:
+            logger.warning(f"Leaderboard read failed, falling back to Postgres: {e}")
+
     pool = await get_db()
     async with pool.acquire() as conn:
         if limit is None:
             records = await conn.fetch(
                 """SELECT name, balance
                 FROM students
-                ORDER BY balance DESC"""
+                ORDER BY balance DESC, id DESC"""
             )
         else:
             records = await conn.fetch(
                 """SELECT name, balance
                 FROM students
-                ORDER BY balance DESC
+                ORDER BY balance DESC, id DESC
+                LIMIT $1""",
+                int(limit)
+            )
+        return [dict(r) for r in records]
+
+
+
+# Резервный подсчёт места идёт по индексу и стоит O(место), поэтому ограничен сверху
+FALLBACK_RANK_LIMIT = 1000
+
+
+async def get_student_neighbourhood(user_id: int, radius: int = 2) -> Optional[Dict]:
+    """Место студента в рейтинге и соседи выше/ниже. None, если студента нет в рейтинге.
+    exact=False — место известно только как «ниже FALLBACK_RANK_LIMIT» (без Redis)."""
+    if _leaderboard is not None:
+        try:
+            rank = await _leaderboard.rank(user_id)
+            if rank is None:
+                return None
+            offset = max(0, rank - 1 - radius)
+            rows = await _leaderboard.top(limit=rank - offset + radius, offset=offset)
+            total = await _leaderboard.size()
+            for place, r in enumerate(rows, offset + 1):
+                r["rank"] = place
+            return {"rank": rank, "exact": True, "total": total, "rows": rows}
+        except Exception as e:
+            logger.warning(f"Leaderboard rank failed, falling back to Postgres: {e}")
+
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        me = await conn.fetchrow(
+            "SELECT id, name, balance FROM students WHERE id = $1",
+            user_id
+        )
+        if not me:
+            return None
+        balance = int(me["balance"] or 0)
+
+        # Порядок рейтинга: balance DESC, id DESC; все запросы идут по индексу (balance, id).
+        ahead = int(await conn.fetchval(
+            """SELECT COUNT(*) FROM (
+                SELECT 1 FROM students
+                WHERE (balance, id) > ($1, $2)
+                LIMIT $3
+            ) t""",
+            balance, user_id, FALLBACK_RANK_LIMIT
+        ))
+        exact = ahead < FALLBACK_RANK_LIMIT
+        rank = 1 + ahead
+        above = await conn.fetch(
+            """SELECT id AS user_id, name, balance
+            FROM students
+            WHERE (balance, id) > ($1, $2)
+            ORDER BY balance ASC, id ASC
+            LIMIT $3""",
+            balance, user_id, int(radius)
+        )
+        below = await conn.fetch(
+            """SELECT id AS user_id, name, balance
+            FROM students
+            WHERE (balance, id) < ($1, $2)
+            ORDER BY balance DESC, id DESC
+            LIMIT $3""",
+            balance, user_id, int(radius)
+        )
+        total = await conn.fetchval("SELECT COUNT(*) FROM students")
+
+    rows = [dict(r) for r in reversed(above)]
+    rows.append({"user_id": int(me["id"]), "name": me["name"], "balance": balance})
+    rows.extend(dict(r) for r in below)
+    first = rank - len(above)
+    for place, r in enumerate(rows, first):
+        r["rank"] = place if exact else None
+    return {"rank": rank, "exact": exact, "total": int(total or 0), "rows": rows}
+
+
+async def get_rating_page(after: Optional[tuple] = None, limit: int = 50) -> List[Dict]:
+    """Страница полного рейтинга по курсору (balance, id) последней показанной строки"""
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        if after is None:
+            records = await conn.fetch(
+                """SELECT id, name, balance
+                FROM students
+                ORDER BY balance DESC, id DESC
                 LIMIT $1""",
                 int(limit)
             )
+        else:
+            records = await conn.fetch(
+                """SELECT id, name, balance
+                FROM students
+                WHERE (balance, id) < ($1, $2)
+                ORDER BY balance DESC, id DESC
+                LIMIT $3""",
+                int(after[0]), int(after[1]), int(limit)
+            )
         return [dict(r) for r in records]
 
 
@@ -255,12 +577,10 @@ async def get_codes_usage(event_id: int = None):
             query = """
                 SELECT c.code, e.name AS event_name, c.points, c.is_income,
                        c.starts_at, c.expires_at, c.max_uses,
-                       COUNT(uc.code_id) AS usage_count
+                       c.uses_count AS usage_count
                 FROM codes c
                 JOIN events e ON c.event_id = e.id
-                LEFT JOIN user_codes uc ON c.id = uc.code_id
                 WHERE c.event_id = $1
-                GROUP BY c.id, e.name
                 ORDER BY c.id DESC
             """
             rows = await conn.fetch(query, event_id)
@@ -268,11 +588,9 @@ async def get_codes_usage(event_id: int = None):
             query = """
                 SELECT c.code, e.name AS event_name, c.points, c.is_income,
                        c.starts_at, c.expires_at, c.max_uses,
-                       COUNT(uc.code_id) AS usage_count
+                       c.uses_count AS usage_count
                 FROM codes c
                 JOIN events e ON c.event_id = e.id
-                LEFT JOIN user_codes uc ON c.id = uc.code_id
-                GROUP BY c.id, e.name
                 ORDER BY c.id DESC
             """
             rows = await conn.fetch(query)
@@ -335,27 +653,115 @@ async def add_code_to_event(
     max_uses: Optional[int] = None,
 ):
     pool = await get_db()
+    code_u = code.upper()
     async with pool.acquire() as conn:
         async with conn.transaction():
-            await conn.execute(
+            inserted = await conn.fetchval(
                 """
                 INSERT INTO codes (event_id, code, points, is_income, starts_at, expires_at, max_uses)
                 VALUES ($1, $2, $3, $4, $5, $6, $7)
                 ON CONFLICT (code) DO NOTHING
+                RETURNING id
                 """,
                 event_id,
-                code.upper(),
+                code_u,
                 points,
                 is_income,
                 starts_at,
                 expires_at,
                 max_uses
             )
-            return {"status": "success", "message": "Код успешно добавлен."}
 
+    if inserted is not None:
+        now = _utcnow()
+        status = compute_status(now, starts_at, expires_at)
+        await _cache_code_status(code_u, status, status_ttl(now, status, starts_at, expires_at))
+
+    return {"status": "success", "message": "Код успешно добавлен."}
 
 
 
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+BULK_CODES_MAX = 1000
+_BULK_MAX_ROUNDS = 10
+
+
+def random_code(length: int = 10) -> str:
+    return "".join(secrets.choice(CODE_ALPHABET) for _ in range(length))
+
+
+async def pick_free_code(length: int = 10, candidates: int = 16) -> str:
+    """Свободный код за один запрос: коллизии отсеиваются в БД пачкой кандидатов"""
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        for _ in range(_BULK_MAX_ROUNDS):
+            batch = list({random_code(length) for _ in range(candidates)})
+            code = await conn.fetchval(
+                """
+                SELECT c FROM unnest($1::text[]) AS c
+                WHERE NOT EXISTS (SELECT 1 FROM codes WHERE code = c)
+                LIMIT 1
+                """,
+                batch,
+            )
+            if code is not None:
+                return code
+    raise RuntimeError("Не удалось подобрать свободный код")
+
+
+async def add_codes_bulk(
+    event_id: int,
+    count: int,
+    points: int,
+    starts_at: Optional[datetime] = None,
+    expires_at: Optional[datetime] = None,
+    max_uses: Optional[int] = 1,
+    length: int = 10,
+) -> List[str]:
+    """Создание count кодов мероприятия в одной транзакции. Возвращает созданные коды"""
+    if not 1 <= count <= BULK_CODES_MAX:
+        raise ValueError(f"count must be in 1..{BULK_CODES_MAX}")
+
+    pool = await get_db()
+    created: List[str] = []
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            for _ in range(_BULK_MAX_ROUNDS):
+                need = count - len(created)
+                if need <= 0:
+                    break
+                # Дубликаты внутри пачки и с существующими кодами отбрасывает ON CONFLICT
+                rows = await conn.fetch(
+                    """
+                    INSERT INTO codes (event_id, code, points, is_income, starts_at, expires_at, max_uses)
+                    SELECT $1, c, $3, TRUE, $4, $5, $6
+                    FROM unnest($2::text[]) AS c
+                    ON CONFLICT (code) DO NOTHING
+                    RETURNING code
+                    """,
+                    event_id,
+                    [random_code(length) for _ in range(need)],
+                    points,
+                    starts_at,
+                    expires_at,
+                    max_uses,
+                )
+                created.extend(r["code"] for r in rows)
+            if len(created) < count:
+                raise RuntimeError(f"Создано только {len(created)} из {count} кодов")
+
+    if _codes_cache is not None:
+        now = _utcnow()
+        status = compute_status(now, starts_at, expires_at)
+        ttl = status_ttl(now, status, starts_at, expires_at)
+        try:
+            await _codes_cache.set_many((c, status, ttl) for c in created)
+        except Exception as e:
+            logger.warning(f"Failed to cache statuses for {len(created)} bulk codes: {e}")
+    return created
+
+
 async def check_code_exists(code: str) -> bool:
     """Проверка существования кода"""
     pool = await get_db()
@@ -384,14 +790,16 @@ async def delete_code(code: str):
                 code.upper()
             )
 
+    await _cache_code_status(code.upper(), "unknown", status_ttl(_utcnow(), "unknown", None, None))
+
 async def delete_event(event_id: int):
     """Удаление мероприятия и всех связанных с ним кодов из базы данных"""
     pool = await get_db()
     async with pool.acquire() as conn:
         async with conn.transaction():
             # Удаление всех кодов, связанных с мероприятием
-            await conn.execute(
-                """DELETE FROM codes WHERE event_id = $1""",
+            deleted = await conn.fetch(
+                """DELETE FROM codes WHERE event_id = $1 RETURNING code""",
                 event_id
             )
             # Удаление самого мероприятия
@@ -400,6 +808,10 @@ async def delete_event(event_id: int):
                 event_id
             )
 
+    ttl = status_ttl(_utcnow(), "unknown", None, None)
+    for r in deleted:
+        await _cache_code_status(r["code"], "unknown", ttl)
+
 async def is_user_registered(user_id: int) -> bool:
     """Проверка, зарегистрирован ли пользователь по его ID"""
     pool = await get_db()
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+from typing import Iterable, Optional
+
+from redis.asyncio.client import Redis as RedisClient
+
+
+def _decode(v) -> str:
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", errors="ignore")
+    return str(v)
+
+
+# Будит планировщик в этом процессе, когда появился новый (возможно, более ранний) дедлайн
+expiry_wakeup = asyncio.Event()
+
+
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ExpirySchedule:
+    """Дедлайны резервов заказов в ZSET (score — reserved_until в unix-секундах) и лок разбора."""
+
+    DEADLINES_KEY = "orders:reserved_until"
+    LOCK_KEY = "orders:expiry:lock"
+
+    def __init__(self, redis: RedisClient):
+        self.redis = redis
+        self._release = redis.register_script(_RELEASE_LOCK_LUA)
+
+    async def add(self, order_id: int, deadline: datetime) -> None:
+        await self.redis.zadd(self.DEADLINES_KEY, {str(order_id): deadline.timestamp()})
+
+    async def remove(self, order_ids: Iterable[int]) -> None:
+        members = [str(x) for x in order_ids]
+        if members:
+            await self.redis.zrem(self.DEADLINES_KEY, *members)
+
+    async def next_deadline(self) -> Optional[float]:
+        head = await self.redis.zrange(self.DEADLINES_KEY, 0, 0, withscores=True)
+        return float(head[0][1]) if head else None
+
+    async def due(self, now: float, limit: int = 1000) -> list[int]:
+        members = await self.redis.zrangebyscore(self.DEADLINES_KEY, "-inf", now, start=0, num=int(limit))
+        return [int(_decode(m)) for m in members]
+
+    async def merge(self, rows: Iterable[dict], snapshot_at: float) -> tuple[int, int]:
+        """Сверка с Postgres без подмены ключа: живые резервы добавляются, а удаляются только
+        записи, которые уже истекли к моменту снимка и в нём отсутствуют. Дедлайны, поставленные
+        параллельными оформлениями после снимка, лежат в будущем и не затрагиваются."""
+        scores = {str(r["id"]): r["reserved_until"].timestamp() for r in rows}
+        if scores:
+            await self.redis.zadd(self.DEADLINES_KEY, scores)
+        due = await self.redis.zrangebyscore(self.DEADLINES_KEY, "-inf", snapshot_at)
+        stale = [m for m in due if _decode(m) not in scores]
+        if stale:
+            await self.redis.zrem(self.DEADLINES_KEY, *stale)
+        return len(scores), len(stale)
+
+    async def acquire_lock(self, token: str, ttl_ms: int) -> bool:
+        return bool(await self.redis.set(self.LOCK_KEY, token, nx=True, px=int(ttl_ms)))
+
+    async def release_lock(self, token: str) -> None:
+        await self._release(keys=[self.LOCK_KEY], args=[token])
@@ -0,0 +1,120 @@
+from typing import Iterable, Optional
+
+from redis.asyncio.client import Redis as RedisClient
+
+
+def _decode(v) -> str:
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", errors="ignore")
+    return str(v) if v is not None else ""
+
+
+# Пишется абсолютный баланс с версией — id последней записи points_ledger студента.
+# Обновления одного студента сериализованы блокировкой строки students, поэтому id
+# журнала растёт вместе с балансом: запоздавшая запись (или пересборка по старому
+# снимку) не перетирает более новую, а потерянная запись исправляется следующей.
+# KEYS: scores, versions; ARGV: member, balance, version
+_SET_BALANCE_LUA = """
+local current = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '-1')
+if current >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+return 1
+"""
+
+
+class Leaderboard:
+    """Рейтинг студентов в Redis: баланс в ZSET, имена и версии балансов в HASH."""
+
+    SCORES_KEY = "leaderboard:balance"
+    NAMES_KEY = "leaderboard:names"
+    VERSIONS_KEY = "leaderboard:versions"
+
+    def __init__(self, redis: RedisClient):
+        self.redis = redis
+        self._set_balance = redis.register_script(_SET_BALANCE_LUA)
+
+    @staticmethod
+    def _member(user_id) -> str:
+        # При равном балансе ZREVRANGE упорядочивает по строке участника по убыванию;
+        # id фиксированной ширины дают тот же порядок, что и balance DESC, id DESC в Postgres.
+        return f"{int(user_id):020d}"
+
+    async def add_member(self, user_id: int, name: str) -> None:
+        """Новый студент: баланс 0, если участника ещё нет (NX не затирает начисления)."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.SCORES_KEY, {self._member(user_id): 0}, nx=True)
+            pipe.hset(self.NAMES_KEY, self._member(user_id), name)
+            await pipe.execute()
+
+    async def set_balance(self, user_id: int, balance: int, version: int) -> bool:
+        """Баланс из Postgres с версией; False — в рейтинге уже более новое значение."""
+        applied = await self._set_balance(
+            keys=[self.SCORES_KEY, self.VERSIONS_KEY],
+            args=[self._member(user_id), int(balance), int(version)],
+        )
+        return bool(int(applied or 0))
+
+    async def reconcile(self, rows: Iterable[dict]) -> int:
+        """Сверка со снимком Postgres (id, name, balance, version) без подмены ключей:
+        балансы пишутся той же версионной записью, что и живые обновления."""
+        names = {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for r in rows:
+                member = self._member(r["id"])
+                names[member] = r["name"] or ""
+                await self._set_balance(
+                    keys=[self.SCORES_KEY, self.VERSIONS_KEY],
+                    args=[member, int(r["balance"] or 0), int(r["version"] or 0)],
+                    client=pipe,
+                )
+            if names:
+                pipe.hset(self.NAMES_KEY, mapping=names)
+                await pipe.execute()
+        # Участники в старом формате (id без дополнения нулями)
+        members = [_decode(m) for m in await self.redis.zrange(self.SCORES_KEY, 0, -1)]
+        await self._remove_members([m for m in members if m != self._member(m)])
+        return len(names)
+
+    async def members_missing_from(self, ids: Iterable[int]) -> list[int]:
+        """Участники рейтинга, которых нет среди ids."""
+        known = {self._member(x) for x in ids}
+        members = await self.redis.zrange(self.SCORES_KEY, 0, -1)
+        return [int(_decode(m)) for m in members if _decode(m) not in known]
+
+    async def remove(self, user_ids: Iterable[int]) -> None:
+        await self._remove_members([self._member(x) for x in user_ids])
+
+    async def _remove_members(self, members: list[str]) -> None:
+        if not members:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.SCORES_KEY, *members)
+            pipe.hdel(self.NAMES_KEY, *members)
+            pipe.hdel(self.VERSIONS_KEY, *members)
+            await pipe.execute()
+
+    async def _with_names(self, pairs) -> list[dict]:
+        if not pairs:
+            return []
+        members = [m for m, _ in pairs]
+        names = await self.redis.hmget(self.NAMES_KEY, members)
+        return [
+            {"user_id": int(_decode(m)), "name": _decode(n), "balance": int(score)}
+            for (m, score), n in zip(pairs, names)
+        ]
+
+    async def top(self, limit: Optional[int] = 10, offset: int = 0) -> list[dict]:
+        stop = -1 if limit is None else offset + int(limit) - 1
+        pairs = await self.redis.zrevrange(self.SCORES_KEY, offset, stop, withscores=True)
+        return await self._with_names(pairs)
+
+    async def rank(self, user_id: int) -> Optional[int]:
+        """Место студента в рейтинге (с 1) или None."""
+        r = await self.redis.zrevrank(self.SCORES_KEY, self._member(user_id))
+        return None if r is None else int(r) + 1
+
+    async def size(self) -> int:
+        return int(await self.redis.zcard(self.SCORES_KEY))
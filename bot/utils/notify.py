@@ -1,10 +1,5 @@
-from aiogram import Bot
-from utils.database import get_all_students
-from utils.config import TOKEN
+from utils.broadcast import enqueue_broadcast
 
-bot = Bot(token=TOKEN)
 
 async def send_broadcast(message):
-    students = await get_all_students()
-    for user_id in students:
-        await bot.send_message(user_id, message)
+    return await enqueue_broadcast(message)
@@ -1,16 +1,104 @@
 import asyncio
 import logging
+import time
+import uuid
 
-from utils.shop_db import expire_orders
+from utils.database import get_expiry_schedule
+from utils.expiry_schedule import expiry_wakeup
+from utils.shop_db import expire_orders, get_live_reservations, get_reserved_deadlines
 
 logger = logging.getLogger(__name__)
 
+EXPIRE_BATCH = 1000
+# Максимальный сон: заодно подхватывает дедлайны, поставленные другими инстансами
+MAX_SLEEP = 60
+# Периодическая сверка расписания с Postgres (потерянные записи, заказы под SKIP LOCKED)
+SAFETY_SCAN_INTERVAL = 600
+LOCK_TTL_MS = 60_000
+ERROR_BACKOFF = 5
+# Дедлайн наступил, но заказ ещё не истёк в Postgres (строка занята выдачей под SKIP LOCKED
+# или часы БД чуть отстают): повторная попытка через эту паузу
+DUE_RETRY = 2
+
+
+async def _drain(schedule=None) -> int:
+    """Истекает просроченные заказы пачками, пока они не закончатся; истёкшие снимаются с расписания."""
+    total = 0
+    while True:
+        expired = await expire_orders(limit=EXPIRE_BATCH)
+        total += len(expired)
+        if schedule is not None and expired:
+            await schedule.remove(expired)
+        if len(expired) < EXPIRE_BATCH:
+            return total
+
+
+async def _sync_schedule(schedule) -> None:
+    snapshot_at = time.time()
+    live, stale = await schedule.merge(await get_reserved_deadlines(), snapshot_at)
+    logger.info(f"Expiry schedule synced: {live} reservations, {stale} stale entries dropped")
+
+
+async def _settle_due(schedule, now: float) -> bool:
+    """Разбирает записи, оставшиеся просроченными после разбора. True — есть живые, ждём повтора."""
+    due = await schedule.due(now)
+    if not due:
+        return False
+    live = set(await get_live_reservations(due))
+    # Заказ уже выдан или удалён, а снять его с расписания не удалось
+    await schedule.remove([x for x in due if x not in live])
+    return bool(live)
+
+
+async def _tick(schedule, token: str) -> float:
+    """Один шаг планировщика. Возвращает, сколько секунд можно спать."""
+    now = time.time()
+    nxt = await schedule.next_deadline()
+    if nxt is None:
+        return MAX_SLEEP
+    if nxt > now:
+        return min(nxt - now, MAX_SLEEP)
+
+    if not await schedule.acquire_lock(token, LOCK_TTL_MS):
+        # Разбором занят другой инстанс
+        return 1
+
+    try:
+        n = await _drain(schedule)
+        pending = await _settle_due(schedule, now)
+    finally:
+        await schedule.release_lock(token)
+    if n:
+        logger.info(f"Expired orders: {n}")
+    return DUE_RETRY if pending else 0
+
+
 async def expire_orders_loop():
+    schedule = get_expiry_schedule()
+    token = uuid.uuid4().hex
+    last_scan = 0.0
+
     while True:
+        expiry_wakeup.clear()
         try:
-            n = await expire_orders(limit=200)
-            if n:
-                logger.info(f"Expired orders: {n}")
+            if schedule is None:
+                # Без Redis: просто регулярный разбор
+                n = await _drain()
+                if n:
+                    logger.info(f"Expired orders: {n}")
+                timeout = MAX_SLEEP
+            else:
+                if time.monotonic() - last_scan >= SAFETY_SCAN_INTERVAL:
+                    await _sync_schedule(schedule)
+                    last_scan = time.monotonic()
+                timeout = await _tick(schedule, token)
         except Exception as e:
             logger.exception(f"expire_orders_loop error: {e}")
-        await asyncio.sleep(3600)
+            timeout = ERROR_BACKOFF
+
+        if timeout <= 0:
+            continue
+        try:
+            await asyncio.wait_for(expiry_wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QR_DIR = "media/qr"
+# Меняется при изменении вёрстки, чтобы старые листы из кэша не отдавались
+SHEET_LAYOUT_VERSION = "1"
+
+# A4 при 150 dpi, сетка 3 x 4
+PAGE_SIZE = (1240, 1754)
+GRID = (3, 4)
+MARGIN = 60
+CAPTION_HEIGHT = 60
+
+# Кэш листов на диске: новый файл появляется на каждый набор кодов, поэтому старые
+# листы удаляются по возрасту и сверх лимита (дольше всех не запрошенные — первыми)
+CACHE_MAX_FILES = 200
+CACHE_MAX_AGE = 7 * 86400
+
+# Telegram принимает в start-параметре только [A-Za-z0-9_-] и не длиннее 64 символов
+_START_PAYLOAD_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def is_deep_link_safe(code: str) -> bool:
+    return _START_PAYLOAD_RE.fullmatch(code or "") is not None
+
+
+def deep_link(bot_username: str, code: str) -> str:
+    return f"https://t.me/{bot_username}?start={code}"
+
+
+def sheet_hash(bot_username: str, items: Iterable[Tuple[str, str]]) -> str:
+    h = hashlib.sha256()
+    h.update(f"{SHEET_LAYOUT_VERSION}\n{bot_username}\n".encode("utf-8"))
+    for code, caption in sorted(items):
+        h.update(f"{code}\t{caption}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def render_sheet_pdf(bot_username: str, items: List[Tuple[str, str]], path: str) -> str:
+    """Рендер многостраничного PDF с QR-кодами. Выполняется в отдельном процессе."""
+    import qrcode
+    from PIL import Image, ImageDraw, ImageFont
+
+    cols, rows = GRID
+    cell_w = (PAGE_SIZE[0] - 2 * MARGIN) // cols
+    cell_h = (PAGE_SIZE[1] - 2 * MARGIN) // rows
+    qr_side = min(cell_w, cell_h - CAPTION_HEIGHT) - 20
+    font = ImageFont.load_default()
+    per_page = cols * rows
+
+    pages = []
+    for start in range(0, len(items), per_page):
+        page = Image.new("RGB", PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+        for i, (code, caption) in enumerate(items[start:start + per_page]):
+            col, row = i % cols, i // cols
+            x0 = MARGIN + col * cell_w
+            y0 = MARGIN + row * cell_h
+
+            qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=2)
+            qr.add_data(deep_link(bot_username, code))
+            qr.make(fit=True)
+            img = qr.make_image(fill_color="black", back_color="white").get_image()
+            img = img.convert("RGB").resize((qr_side, qr_side), Image.NEAREST)
+            page.paste(img, (x0 + (cell_w - qr_side) // 2, y0))
+
+            text_y = y0 + qr_side + 8
+            for line in (code, caption):
+                if not line:
+                    continue
+                w = draw.textlength(line, font=font)
+                draw.text((x0 + (cell_w - w) / 2, text_y), line, fill="black", font=font)
+                text_y += 18
+
+            draw.rectangle((x0, y0 - 10, x0 + cell_w - 1, y0 + cell_h - 11), outline=(200, 200, 200))
+        pages.append(page)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".pdf.tmp")
+    os.close(fd)
+    try:
+        pages[0].save(tmp, "PDF", resolution=150, save_all=True, append_images=pages[1:])
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def prune_sheets(max_files: int = CACHE_MAX_FILES, max_age: float = CACHE_MAX_AGE) -> int:
+    """Удаляет из QR_DIR устаревшие листы. Возвращает число удалённых файлов."""
+    try:
+        names = [n for n in os.listdir(QR_DIR) if n.endswith(".pdf")]
+    except FileNotFoundError:
+        return 0
+    entries = []
+    for name in names:
+        path = os.path.join(QR_DIR, name)
+        try:
+            entries.append((os.stat(path).st_mtime, path))
+        except FileNotFoundError:
+            continue
+    entries.sort(reverse=True)
+    now = time.time()
+    removed = 0
+    for i, (mtime, path) in enumerate(entries):
+        if i < max_files and now - mtime < max_age:
+            continue
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max(1, min(2, os.cpu_count() or 1)))
+    return _executor
+
+
+async def get_sheet(bot_username: str, items: List[Tuple[str, str]]) -> str:
+    """Путь к PDF-листу для набора (code, подпись); повторные запросы отдаются из кэша на диске."""
+    if not items:
+        raise ValueError("no codes to render")
+    path = os.path.join(QR_DIR, f"{sheet_hash(bot_username, items)}.pdf")
+    try:
+        # mtime — время последнего запроса: по нему считаются возраст и очередь на удаление
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_executor(), render_sheet_pdf, bot_username, items, path)
+    logger.info(f"Rendered QR sheet {path} ({len(items)} codes)")
+    removed = await asyncio.to_thread(prune_sheets)
+    if removed:
+        logger.info(f"Pruned {removed} cached QR sheets")
+    return path
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import uuid
+from typing import Optional
+
+from redis.asyncio.client import Redis as RedisClient
+
+logger = logging.getLogger(__name__)
+
+
+_RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """Аренда роли «единственный исполнитель» среди процессов: ключ с TTL, продлеваемый фоном."""
+
+    def __init__(self, redis: RedisClient, key: str, ttl_ms: int = 30_000):
+        self.redis = redis
+        self.key = key
+        self.ttl_ms = int(ttl_ms)
+        self.token = uuid.uuid4().hex
+        self.held = False
+        self._renew = redis.register_script(_RENEW_LUA)
+        self._release = redis.register_script(_RELEASE_LUA)
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def acquire(self) -> bool:
+        if self.held:
+            return True
+        ok = await self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms)
+        if ok:
+            self.held = True
+            self._heartbeat = asyncio.create_task(self._keep_alive())
+        return self.held
+
+    async def _keep_alive(self) -> None:
+        while self.held:
+            await asyncio.sleep(self.ttl_ms / 3000)
+            try:
+                renewed = await self._renew(keys=[self.key], args=[self.token, self.ttl_ms])
+            except Exception as e:
+                logger.warning(f"Lease {self.key} renewal failed: {e}")
+                renewed = 0
+            if not int(renewed or 0):
+                logger.warning(f"Lease {self.key} lost")
+                self.held = False
+
+    async def release(self) -> None:
+        self.held = False
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        try:
+            await self._release(keys=[self.key], args=[self.token])
+        except Exception as e:
+            logger.warning(f"Lease {self.key} release failed: {e}")
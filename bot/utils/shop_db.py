@@ -1,5 +1,11 @@
-from utils.database import get_db
-from typing import Any
+import functools
+
+from utils.database import (
+    get_db, sync_leaderboard, schedule_order_expiry, unschedule_order_expiry,
+    bump_catalog_version, get_catalog_version,
+)
+from utils.catalog_cache import CatalogCache
+from typing import Any, Optional
 
 async def seed_products_if_empty():
     pool = await get_db()
@@ -9,23 +15,168 @@ async def seed_products_if_empty():
             return
         await conn.execute(
             """
-            INSERT INTO products(name, price_points, stock, is_active)
-            VALUES
-            ('Носки', 50, 100, TRUE),
-            ('Трусы', 80, 50, TRUE),
-            ('Пижама', 200, 20, TRUE);
+            WITH created AS (
+                INSERT INTO products(name, price_points, stock, is_active)
+                VALUES
+                ('Носки', 50, 100, TRUE),
+                ('Трусы', 80, 50, TRUE),
+                ('Пижама', 200, 20, TRUE)
+                RETURNING id, stock
+            )
+            INSERT INTO stock_ledger (product_id, delta, reason)
+            SELECT id, stock, 'create' FROM created;
             """
         )
 
-async def get_products():
+async def _load_products():
     pool = await get_db()
     async with pool.acquire() as conn:
         rows = await conn.fetch(
-            "SELECT id, name, price_points, stock FROM products WHERE is_active = TRUE AND stock > 0 ORDER BY id ASC"
+            """
+            SELECT p.id, p.name, p.price_points, p.stock, img.telegram_file_id
+            FROM products p
+            LEFT JOIN LATERAL (
+                SELECT telegram_file_id
+                FROM product_images
+                WHERE product_id = p.id AND is_main = TRUE
+                ORDER BY id DESC
+                LIMIT 1
+            ) img ON TRUE
+            WHERE p.is_active = TRUE AND p.stock > 0
+            ORDER BY p.id ASC
+            """
         )
         return [dict(r) for r in rows]
 
 
+async def get_live_reservations(order_ids: list[int]) -> list[int]:
+    """Какие из заказов всё ещё ждут выдачи с дедлайном резерва."""
+    if not order_ids:
+        return []
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT id
+            FROM orders
+            WHERE id = ANY($1::int[])
+              AND status IN ('RESERVED', 'CHECKED_OUT')
+              AND reserved_until IS NOT NULL
+            """,
+            [int(x) for x in order_ids]
+        )
+        return [int(r["id"]) for r in rows]
+
+
+_catalog = CatalogCache(_load_products, shared_version=get_catalog_version)
+
+
+async def invalidate_catalog():
+    _catalog.invalidate()
+    await bump_catalog_version()
+
+
+def _invalidates_catalog(func):
+    """Сбрасывает кэш каталога после завершения (и коммита) операции, меняющей товары или остатки."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            await invalidate_catalog()
+    return wrapper
+
+
+def _syncs_leaderboard(func):
+    """После успешного списания баллов переносит новый баланс в рейтинг Redis."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        res = await func(*args, **kwargs)
+        if res.get("ok") and "new_balance" in res:
+            await sync_leaderboard(int(res["user_id"]), int(res["new_balance"]), res.get("ledger_id"))
+        return res
+    return wrapper
+
+
+def _tracks_expiry(func):
+    """После коммита ставит дедлайн нового резерва в расписание истечения или снимает его с выданного заказа."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        res = await func(*args, **kwargs)
+        if res.get("ok") and res.get("order_id") is not None:
+            if res.get("reserved_until") is not None:
+                await schedule_order_expiry(int(res["order_id"]), res["reserved_until"])
+            else:
+                await unschedule_order_expiry([int(res["order_id"])])
+        return res
+    return wrapper
+
+
+async def get_products():
+    return await _catalog.get()
+
+
+async def get_shop_view(user_id: int, idx: int) -> dict[str, Any] | None:
+    """Данные карточки магазина: товар из кэша каталога и состояние пользователя одним запросом"""
+    products = await get_products()
+    if not products:
+        return None
+
+    idx = idx % len(products)
+    product = products[idx]
+
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            WITH checked AS (
+                SELECT id FROM orders
+                WHERE user_id = $1 AND status = 'CHECKED_OUT'
+                ORDER BY id DESC
+                LIMIT 1
+            ),
+            existing AS (
+                SELECT id FROM orders
+                WHERE user_id = $1 AND status = 'DRAFT'
+                ORDER BY id DESC
+                LIMIT 1
+            ),
+            created AS (
+                INSERT INTO orders(user_id, status, total_points)
+                SELECT $1, 'DRAFT', 0
+                WHERE NOT EXISTS (SELECT 1 FROM checked)
+                  AND NOT EXISTS (SELECT 1 FROM existing)
+                RETURNING id
+            )
+            SELECT
+                (SELECT id FROM checked) AS checked_out_id,
+                COALESCE((SELECT id FROM existing), (SELECT id FROM created)) AS order_id,
+                COALESCE((
+                    SELECT oi.qty FROM order_items oi
+                    JOIN existing e ON e.id = oi.order_id
+                    WHERE oi.product_id = $2
+                ), 0) AS qty,
+                COALESCE((
+                    SELECT SUM(oi.qty) FROM order_items oi
+                    JOIN existing e ON e.id = oi.order_id
+                ), 0) AS cart_qty,
+                (SELECT balance FROM students WHERE id = $1) AS balance
+            """,
+            user_id, int(product["id"])
+        )
+
+    return {
+        "product": product,
+        "idx": idx,
+        "total_count": len(products),
+        "checked_out": row["checked_out_id"] is not None,
+        "order_id": row["order_id"],
+        "qty": int(row["qty"] or 0),
+        "cart_qty": int(row["cart_qty"] or 0),
+        "balance": int(row["balance"] or 0),
+    }
+
+
 async def get_checked_out_order_id(user_id: int):
     pool = await get_db()
     async with pool.acquire() as conn:
@@ -144,6 +295,96 @@ async def calc_order_total(order_id: int):
         )
         return int(total or 0)
 
+# Изменение остатков по всему заказу одним запросом, всё или ничего.
+# Строки товаров блокируются в порядке id (без взаимных дедлоков), затем проверяются
+# списания (delta < 0); если хоть одной позиции не хватает, UPDATE не трогает ни одной строки,
+# а запрос возвращает нехватки. Применённые изменения пишутся в stock_ledger тем же запросом.
+_APPLY_STOCK_DELTA_SQL = """
+WITH want AS (
+    SELECT * FROM unnest($1::int[], $2::int[]) AS w(product_id, delta)
+    WHERE w.delta <> 0
+),
+locked AS MATERIALIZED (
+    SELECT p.id, p.stock, p.is_active
+    FROM products p
+    WHERE p.id IN (SELECT product_id FROM want)
+    ORDER BY p.id
+    FOR UPDATE
+),
+short AS (
+    SELECT w.product_id,
+           -w.delta AS need,
+           CASE WHEN l.is_active OR NOT $3 THEN COALESCE(l.stock, 0) ELSE 0 END AS have
+    FROM want w
+    LEFT JOIN locked l ON l.id = w.product_id
+    WHERE w.delta < 0
+      AND (l.id IS NULL OR l.stock < -w.delta OR ($3 AND NOT l.is_active))
+),
+applied AS (
+    UPDATE products p
+    SET stock = p.stock + w.delta
+    FROM want w
+    JOIN locked l ON l.id = w.product_id
+    WHERE p.id = w.product_id
+      AND NOT EXISTS (SELECT 1 FROM short)
+    RETURNING p.id
+),
+booked AS (
+    INSERT INTO stock_ledger (product_id, delta, reason, order_id, actor_id)
+    SELECT w.product_id, w.delta, $4::text, $5::int, $6::bigint
+    FROM applied a
+    JOIN want w ON w.product_id = a.id
+)
+SELECT product_id, need, have FROM short ORDER BY product_id
+"""
+
+
+async def _apply_stock_delta(
+    conn,
+    deltas: dict[int, int],
+    reason: str,
+    order_id: int | None = None,
+    actor_id: int | None = None,
+    require_active: bool = False,
+) -> list[dict[str, Any]]:
+    """Применяет {product_id: ±qty} к остаткам. Возвращает нехватки; если они есть, остатки не меняются."""
+    deltas = {int(pid): int(d) for pid, d in deltas.items() if int(d) != 0}
+    if not deltas:
+        return []
+    rows = await conn.fetch(
+        _APPLY_STOCK_DELTA_SQL,
+        list(deltas.keys()),
+        list(deltas.values()),
+        bool(require_active),
+        reason,
+        int(order_id) if order_id is not None else None,
+        int(actor_id) if actor_id is not None else None,
+    )
+    return [{"product_id": int(r["product_id"]), "need": int(r["need"]), "have": int(r["have"])} for r in rows]
+
+
+async def _charge_points(conn, user_id: int, total: int, order_id: int) -> Optional[int]:
+    """Списание баллов за заказ вместе с записью в points_ledger. Возвращает id записи журнала."""
+    return await conn.fetchval(
+        """
+        WITH charged AS (
+            UPDATE students SET balance = balance - $2::int WHERE id = $1 RETURNING id
+        )
+        INSERT INTO points_ledger (user_id, delta, reason, order_id)
+        SELECT id, -$2::int, 'order', $3::int FROM charged
+        RETURNING id
+        """,
+        int(user_id), int(total), int(order_id)
+    )
+
+
+def _with_names(lacking: list[dict[str, Any]], items) -> list[dict[str, Any]]:
+    names = {int(it["product_id"]): it["name"] for it in items}
+    return [{**x, "name": names.get(x["product_id"])} for x in lacking]
+
+
+@_invalidates_catalog
+@_tracks_expiry
 async def checkout_order(user_id: int):
     pool = await get_db()
     async with pool.acquire() as conn:
@@ -176,7 +417,7 @@ async def checkout_order(user_id: int):
                 JOIN products p ON p.id = oi.product_id
                 WHERE oi.order_id = $1
                 ORDER BY oi.product_id ASC
-                FOR UPDATE
+                FOR UPDATE OF oi
                 """,
                 int(order_id)
             )
@@ -195,48 +436,49 @@ async def checkout_order(user_id: int):
             if balance < total:
                 return {"ok": False, "reason": "not_enough", "need": int(total), "balance": int(balance)}
 
-            lacking = []
-            for it in items:
-                pid = int(it["product_id"])
-                need = int(it["qty"])
-                have = await conn.fetchval(
-                    "SELECT stock FROM products WHERE id = $1 AND is_active = TRUE FOR UPDATE",
-                    pid
-                )
-                have = int(have or 0)
-                if have < need:
-                    lacking.append({"product_id": pid, "name": it["name"], "need": need, "have": have})
-
+            lacking = await _apply_stock_delta(
+                conn,
+                {int(it["product_id"]): -int(it["qty"]) for it in items},
+                reason="reserve",
+                order_id=int(order_id),
+                actor_id=user_id,
+                require_active=True,
+            )
             if lacking:
-                return {"ok": False, "reason": "out_of_stock", "items": lacking}
-
-            for it in items:
-                pid = int(it["product_id"])
-                need = int(it["qty"])
-                await conn.execute(
-                    "UPDATE products SET stock = stock - $1 WHERE id = $2",
-                    need, pid
-                )
+                return {"ok": False, "reason": "out_of_stock", "items": _with_names(lacking, items)}
 
-            await conn.execute(
-            """
-            UPDATE orders
-            SET status = 'RESERVED',
-                total_points = $1,
-                reserved_until = NOW() + INTERVAL '1 hour'
-            WHERE id = $2
-            """,
-            int(total), int(order_id)
-)
+            reserved_until = await conn.fetchval(
+                """
+                UPDATE orders
+                SET status = 'RESERVED',
+                    total_points = $1,
+                    reserved_until = NOW() + INTERVAL '1 hour'
+                WHERE id = $2
+                RETURNING reserved_until
+                """,
+                int(total), int(order_id)
+            )
 
-            return {"ok": True, "order_id": int(order_id), "total": int(total)}
+            return {"ok": True, "order_id": int(order_id), "total": int(total), "reserved_until": reserved_until}
 
 
+@_invalidates_catalog
 async def create_product(name: str, price_points: int, stock: int):
     pool = await get_db()
     async with pool.acquire() as conn:
         return await conn.fetchval(
-            "INSERT INTO products(name, price_points, stock, is_active) VALUES ($1, $2, $3, TRUE) RETURNING id",
+            """
+            WITH created AS (
+                INSERT INTO products(name, price_points, stock, is_active)
+                VALUES ($1, $2, $3, TRUE)
+                RETURNING id, stock
+            ),
+            booked AS (
+                INSERT INTO stock_ledger (product_id, delta, reason)
+                SELECT id, stock, 'create' FROM created WHERE stock <> 0
+            )
+            SELECT id FROM created
+            """,
             name.strip(), int(price_points), int(stock)
         )
 
@@ -254,6 +496,7 @@ async def list_products(include_inactive: bool = False):
         return [dict(r) for r in rows]
 
 
+@_invalidates_catalog
 async def set_product_active(product_id: int, is_active: bool):
     pool = await get_db()
     async with pool.acquire() as conn:
@@ -262,6 +505,7 @@ async def set_product_active(product_id: int, is_active: bool):
             bool(is_active), int(product_id)
         )
 
+@_invalidates_catalog
 async def set_product_main_image(product_id: int, telegram_file_id: str, telegram_file_unique_id: str, storage_path: str = None, mime: str = None, size_bytes: int = None, width: int = None, height: int = None):
     pool = await get_db()
     async with pool.acquire() as conn:
@@ -302,6 +546,7 @@ async def get_product_main_image(product_id: int):
         return dict(row) if row else None
 
 
+@_invalidates_catalog
 async def set_product_main_image(
     product_id: int,
     telegram_file_id: str,
@@ -345,17 +590,30 @@ async def set_product_main_image(
                 height
             )
 
+@_invalidates_catalog
 async def update_product(product_id: int, name: str | None = None, price_points: int | None = None, stock: int | None = None):
     pool = await get_db()
     async with pool.acquire() as conn:
+        # Ручная правка остатка попадает в журнал разницей со старым значением
         await conn.execute(
             """
-            UPDATE products
-            SET
-              name = COALESCE($2, name),
-              price_points = COALESCE($3, price_points),
-              stock = COALESCE($4, stock)
-            WHERE id = $1
+            WITH old AS (
+                SELECT id, stock FROM products WHERE id = $1 FOR UPDATE
+            ),
+            updated AS (
+                UPDATE products p
+                SET
+                  name = COALESCE($2, p.name),
+                  price_points = COALESCE($3, p.price_points),
+                  stock = COALESCE($4, p.stock)
+                FROM old
+                WHERE p.id = old.id
+                RETURNING p.id, p.stock, old.stock AS old_stock
+            )
+            INSERT INTO stock_ledger (product_id, delta, reason)
+            SELECT id, stock - old_stock, 'adjust'
+            FROM updated
+            WHERE stock <> old_stock
             """,
             int(product_id),
             name.strip() if name is not None else None,
@@ -372,6 +630,9 @@ async def get_product(product_id: int):
         )
         return dict(row) if row else None
 
+@_invalidates_catalog
+@_syncs_leaderboard
+@_tracks_expiry
 async def fulfill_order_by_admin(order_id: int, admin_id: int) -> dict[str, Any]:
     pool = await get_db()
     async with pool.acquire() as conn:
@@ -403,7 +664,7 @@ async def fulfill_order_by_admin(order_id: int, admin_id: int) -> dict[str, Any]
                 JOIN products p ON p.id = oi.product_id
                 WHERE oi.order_id = $1
                 ORDER BY oi.product_id ASC
-                FOR UPDATE
+                FOR UPDATE OF oi
                 """,
                 int(order_id)
             )
@@ -426,33 +687,17 @@ async def fulfill_order_by_admin(order_id: int, admin_id: int) -> dict[str, Any]
             if balance < total:
                 return {"ok": False, "reason": "not_enough", "need": total, "balance": balance}
 
-            lacking = []
-            for it in items:
-                pid = int(it["product_id"])
-                need = int(it["qty"])
-                have = await conn.fetchval(
-                    "SELECT stock FROM products WHERE id = $1 FOR UPDATE",
-                    pid
-                )
-                have = int(have or 0)
-                if have < need:
-                    lacking.append({"product_id": pid, "name": it["name"], "need": need, "have": have})
-
+            lacking = await _apply_stock_delta(
+                conn,
+                {int(it["product_id"]): -int(it["qty"]) for it in items},
+                reason="issue",
+                order_id=int(order_id),
+                actor_id=int(admin_id),
+            )
             if lacking:
-                return {"ok": False, "reason": "out_of_stock", "items": lacking}
-
-            for it in items:
-                pid = int(it["product_id"])
-                need = int(it["qty"])
-                await conn.execute(
-                    "UPDATE products SET stock = stock - $1 WHERE id = $2",
-                    need, pid
-                )
+                return {"ok": False, "reason": "out_of_stock", "items": _with_names(lacking, items)}
 
-            await conn.execute(
-                "UPDATE students SET balance = balance - $1 WHERE id = $2",
-                total, user_id
-            )
+            ledger_id = await _charge_points(conn, user_id, total, int(order_id))
 
             await conn.execute(
                 """
@@ -467,7 +712,14 @@ async def fulfill_order_by_admin(order_id: int, admin_id: int) -> dict[str, Any]
             )
 
             new_balance = balance - total
-            return {"ok": True, "user_id": user_id, "total": total, "new_balance": new_balance}
+            return {
+                "ok": True,
+                "order_id": int(order_id),
+                "user_id": user_id,
+                "total": total,
+                "new_balance": new_balance,
+                "ledger_id": ledger_id,
+            }
         
 async def get_cart_qty(order_id: int) -> int:
     pool = await get_db()
@@ -520,6 +772,9 @@ async def get_order_for_issue(order_id: int) -> dict[str, Any]:
         }
 
 
+@_invalidates_catalog
+@_syncs_leaderboard
+@_tracks_expiry
 async def issue_order_by_admin(order_id: int, admin_id: int, issued_qty: dict[int, int]) -> dict[str, Any]:
     pool = await get_db()
     async with pool.acquire() as conn:
@@ -551,7 +806,7 @@ async def issue_order_by_admin(order_id: int, admin_id: int, issued_qty: dict[in
                 JOIN products p ON p.id = oi.product_id
                 WHERE oi.order_id = $1
                 ORDER BY oi.product_id ASC
-                FOR UPDATE
+                FOR UPDATE OF oi
                 """,
                 int(order_id)
             )
@@ -576,14 +831,13 @@ async def issue_order_by_admin(order_id: int, admin_id: int, issued_qty: dict[in
 
             if total <= 0:
                 if status == "RESERVED":
-                    for it in items:
-                        pid = int(it["product_id"])
-                        q_ordered = int(it["qty"])
-                        if q_ordered > 0:
-                            await conn.execute(
-                                "UPDATE products SET stock = stock + $1 WHERE id = $2",
-                                q_ordered, pid
-                            )
+                    await _apply_stock_delta(
+                        conn,
+                        {int(it["product_id"]): int(it["qty"]) for it in items},
+                        reason="release",
+                        order_id=int(order_id),
+                        actor_id=int(admin_id),
+                    )
                 await conn.execute(
                     """
                     UPDATE orders
@@ -598,35 +852,7 @@ async def issue_order_by_admin(order_id: int, admin_id: int, issued_qty: dict[in
                 balance = await conn.fetchval("SELECT balance FROM students WHERE id = $1", user_id)
                 return {"ok": False, "reason": "nothing_to_issue", "balance": int(balance or 0)}
 
-            if status == "CHECKED_OUT":
-                lacking = []
-                for it in items:
-                    pid = int(it["product_id"])
-                    need = int(normalized[pid])
-                    if need <= 0:
-                        continue
-                    have = await conn.fetchval("SELECT stock FROM products WHERE id = $1 FOR UPDATE", pid)
-                    have = int(have or 0)
-                    if have < need:
-                        lacking.append({"product_id": pid, "name": it["name"], "need": need, "have": have})
-                if lacking:
-                    return {"ok": False, "reason": "out_of_stock", "items": lacking}
-
-                for it in items:
-                    pid = int(it["product_id"])
-                    need = int(normalized[pid])
-                    if need > 0:
-                        await conn.execute("UPDATE products SET stock = stock - $1 WHERE id = $2", need, pid)
-
-            if status == "RESERVED":
-                for it in items:
-                    pid = int(it["product_id"])
-                    q_ordered = int(it["qty"])
-                    q_issue = int(normalized[pid])
-                    diff = q_ordered - q_issue
-                    if diff > 0:
-                        await conn.execute("UPDATE products SET stock = stock + $1 WHERE id = $2", diff, pid)
-
+            # Баланс проверяется до движения остатков, чтобы отказ не оставлял их изменёнными
             balance = await conn.fetchval(
                 "SELECT balance FROM students WHERE id = $1 FOR UPDATE",
                 user_id
@@ -635,10 +861,20 @@ async def issue_order_by_admin(order_id: int, admin_id: int, issued_qty: dict[in
             if balance < total:
                 return {"ok": False, "reason": "not_enough", "need": total, "balance": balance}
 
-            await conn.execute(
-                "UPDATE students SET balance = balance - $1 WHERE id = $2",
-                int(total), int(user_id)
-            )
+            if status == "CHECKED_OUT":
+                # Товар ещё не зарезервирован: списываем выдаваемое
+                deltas = {pid: -q for pid, q in normalized.items()}
+                reason = "issue"
+            else:
+                # Резерв уже списан: возвращаем невыданный остаток
+                deltas = {int(it["product_id"]): int(it["qty"]) - normalized[int(it["product_id"])] for it in items}
+                reason = "release"
+
+            lacking = await _apply_stock_delta(conn, deltas, reason=reason, order_id=int(order_id), actor_id=int(admin_id))
+            if lacking:
+                return {"ok": False, "reason": "out_of_stock", "items": _with_names(lacking, items)}
+
+            ledger_id = await _charge_points(conn, user_id, int(total), int(order_id))
 
             await conn.execute(
                 """
@@ -652,7 +888,14 @@ async def issue_order_by_admin(order_id: int, admin_id: int, issued_qty: dict[in
                 int(order_id), int(admin_id), int(total)
             )
 
-            return {"ok": True, "user_id": user_id, "total": int(total), "new_balance": balance - int(total)}
+            return {
+                "ok": True,
+                "order_id": int(order_id),
+                "user_id": user_id,
+                "total": int(total),
+                "new_balance": balance - int(total),
+                "ledger_id": ledger_id,
+            }
 
 async def get_active_order_id(user_id: int):
     pool = await get_db()
@@ -669,49 +912,90 @@ async def get_active_order_id(user_id: int):
         )
 
 
-async def expire_orders(limit: int = 50) -> int:
+async def get_reserved_deadlines() -> list[dict[str, Any]]:
+    """Все действующие дедлайны резервов: для пересборки расписания истечения."""
     pool = await get_db()
     async with pool.acquire() as conn:
-        async with conn.transaction():
-            order_ids = await conn.fetch(
-                """
-                SELECT id
-                FROM orders
-                WHERE status IN ('RESERVED', 'CHECKED_OUT')
-                  AND reserved_until IS NOT NULL
-                  AND reserved_until < NOW()
-                ORDER BY reserved_until ASC
-                LIMIT $1
-                FOR UPDATE SKIP LOCKED
-                """,
-                int(limit)
-            )
-
-            expired = 0
-            for r in order_ids:
-                oid = int(r["id"])
+        rows = await conn.fetch(
+            """
+            SELECT id, reserved_until
+            FROM orders
+            WHERE status IN ('RESERVED', 'CHECKED_OUT')
+              AND reserved_until IS NOT NULL
+            """
+        )
+        return [dict(r) for r in rows]
 
-                items = await conn.fetch(
-                    """
-                    SELECT product_id, qty
-                    FROM order_items
-                    WHERE order_id = $1
-                    FOR UPDATE
-                    """,
-                    oid
-                )
 
-                for it in items:
-                    pid = int(it["product_id"])
-                    q = int(it["qty"])
-                    if q > 0:
-                        await conn.execute(
-                            "UPDATE products SET stock = stock + $1 WHERE id = $2",
-                            q, pid
-                        )
+# Истечение пачки резервов одним запросом: заказы и позиции удаляются, количества
+# суммируются по товарам и возвращаются на склад одним UPDATE (строки товаров
+# блокируются в порядке id, как в _apply_stock_delta), в stock_ledger — по строке на позицию.
+_EXPIRE_ORDERS_SQL = """
+WITH lapsed AS (
+    SELECT id, status
+    FROM orders
+    WHERE status IN ('RESERVED', 'CHECKED_OUT')
+      AND reserved_until IS NOT NULL
+      AND reserved_until < NOW()
+    ORDER BY reserved_until ASC
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+),
+gone_items AS (
+    DELETE FROM order_items oi
+    USING lapsed l
+    WHERE oi.order_id = l.id
+    RETURNING oi.order_id, oi.product_id, oi.qty, l.status
+),
+gone_orders AS (
+    DELETE FROM orders o
+    USING lapsed l
+    WHERE o.id = l.id
+    RETURNING o.id
+),
+-- Остаток держат только RESERVED: для CHECKED_OUT склад списывается при выдаче
+released AS (
+    SELECT order_id, product_id, qty
+    FROM gone_items
+    WHERE status = 'RESERVED' AND qty > 0
+),
+per_product AS (
+    SELECT product_id, SUM(qty)::int AS qty
+    FROM released
+    GROUP BY product_id
+),
+locked AS MATERIALIZED (
+    SELECT p.id
+    FROM products p
+    WHERE p.id IN (SELECT product_id FROM per_product)
+    ORDER BY p.id
+    FOR UPDATE
+),
+restored AS (
+    UPDATE products p
+    SET stock = p.stock + pp.qty
+    FROM per_product pp
+    JOIN locked l ON l.id = pp.product_id
+    WHERE p.id = pp.product_id
+    RETURNING p.id
+),
+booked AS (
+    INSERT INTO stock_ledger (product_id, delta, reason, order_id)
+    SELECT r.product_id, r.qty, 'expire', r.order_id
+    FROM released r
+    JOIN restored ON restored.id = r.product_id
+)
+SELECT id FROM gone_orders
+"""
 
-                await conn.execute("DELETE FROM order_items WHERE order_id = $1", oid)
-                await conn.execute("DELETE FROM orders WHERE id = $1", oid)
-                expired += 1
 
-            return expired
+async def expire_orders(limit: int = 50) -> list[int]:
+    """Истекает пачку просроченных резервов. Возвращает id истёкших заказов."""
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(_EXPIRE_ORDERS_SQL, int(limit))
+    expired = [int(r["id"]) for r in rows]
+    # Пустой разбор остатки не менял — кэш каталога не трогаем
+    if expired:
+        await invalidate_catalog()
+    return expired
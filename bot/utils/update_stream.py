@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from utils.config import REDIS_URL, UPDATE_PARTITIONS, WORKER_INDEX, WORKER_COUNT
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = "updates"
+GROUP = "bot-workers"
+STREAM_MAXLEN = 100_000
+READ_COUNT = 100
+READ_BLOCK_MS = 5000
+POLL_TIMEOUT = 30
+# Ingress публикует апдейт до сдвига offset, и после падения между ними апдейт уходит
+# в поток повторно; воркер отбрасывает уже виденные update_id в течение этого срока.
+DEDUP_TTL = 86400
+
+_SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def stream_key(partition: int) -> str:
+    return f"{STREAM_PREFIX}:{partition}"
+
+
+def update_user_id(raw: dict) -> int:
+    """Пользователь, к которому относится апдейт: from.id, иначе chat.id, иначе 0."""
+    for key, value in raw.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        sender = value.get("from") or value.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return int(sender["id"])
+        chat = value.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+        message = value.get("message")
+        if isinstance(message, dict) and isinstance(message.get("chat"), dict):
+            return int(message["chat"]["id"])
+    return 0
+
+
+def partition_for(raw: dict, partitions: int = UPDATE_PARTITIONS) -> int:
+    return abs(update_user_id(raw)) % max(1, partitions)
+
+
+def worker_partitions(index: int = WORKER_INDEX, count: int = WORKER_COUNT,
+                      partitions: int = UPDATE_PARTITIONS) -> list[int]:
+    """Партиции, закреплённые за воркером: каждая читается ровно одним воркером."""
+    return [p for p in range(max(1, partitions)) if p % max(1, count) == index]
+
+
+async def publish_update(redis: Redis, raw: dict) -> None:
+    await redis.xadd(
+        stream_key(partition_for(raw)),
+        {"u": json.dumps(raw, ensure_ascii=False)},
+        maxlen=STREAM_MAXLEN,
+        approximate=True,
+    )
+
+
+async def run_polling_ingress(bot: Bot, dp: Dispatcher) -> None:
+    """Единственный long polling, складывающий апдейты в Redis Streams"""
+    redis = Redis.from_url(REDIS_URL, decode_responses=False)
+    await bot.delete_webhook(drop_pending_updates=False)
+    allowed = dp.resolve_used_update_types()
+    offset: Optional[int] = None
+    try:
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT, allowed_updates=allowed)
+            except Exception as e:
+                logger.warning(f"Ingress get_updates failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                raw = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+                await publish_update(redis, raw)
+                offset = update.update_id + 1
+    finally:
+        await redis.close()
+
+
+def build_webhook_ingress_app(path: str, secret: Optional[str]) -> web.Application:
+    """aiohttp-приложение, которое принимает webhook и кладёт апдейт в поток без обработки"""
+    redis = Redis.from_url(REDIS_URL, decode_responses=False)
+
+    async def handle(request: web.Request) -> web.Response:
+        if secret and request.headers.get(_SECRET_HEADER) != secret:
+            return web.Response(status=401)
+        raw = await request.json()
+        await publish_update(redis, raw)
+        return web.Response()
+
+    async def close_redis(app: web.Application):
+        await redis.close()
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    app.on_cleanup.append(close_redis)
+    return app
+
+
+async def _first_delivery(redis: Redis, raw: dict, entry_id) -> bool:
+    """False, если этот update_id уже пришёл другой записью потока.
+    Повторная выдача той же записи (дочитывание после рестарта) дублем не считается."""
+    update_id = raw.get("update_id")
+    if update_id is None:
+        return True
+    key = f"{STREAM_PREFIX}:seen:{update_id}"
+    if isinstance(entry_id, str):
+        entry_id = entry_id.encode()
+    try:
+        if await redis.set(key, entry_id, nx=True, ex=DEDUP_TTL):
+            return True
+        owner = await redis.get(key)
+    except Exception as e:
+        logger.warning(f"Update {update_id} dedup check failed: {e}")
+        return True
+    return owner is None or owner == entry_id
+
+
+async def _ensure_group(redis: Redis, key: str) -> None:
+    try:
+        await redis.xgroup_create(key, GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def _consume_partition(redis: Redis, bot: Bot, dp: Dispatcher, partition: int, consumer: str) -> None:
+    key = stream_key(partition)
+    await _ensure_group(redis, key)
+    # Сначала дочитываем то, что было выдано этому консьюмеру, но не подтверждено до рестарта.
+    last_id = "0"
+    while True:
+        try:
+            resp = await redis.xreadgroup(
+                GROUP, consumer, {key: last_id}, count=READ_COUNT, block=READ_BLOCK_MS
+            )
+        except Exception as e:
+            logger.warning(f"Stream {key} read failed: {e}")
+            await asyncio.sleep(1)
+            continue
+
+        entries = resp[0][1] if resp else []
+        if not entries and last_id != ">":
+            last_id = ">"
+            continue
+
+        for entry_id, fields in entries:
+            data = fields.get(b"u") or fields.get("u")
+            try:
+                raw = json.loads(data)
+                if await _first_delivery(redis, raw, entry_id):
+                    await dp.feed_raw_update(bot, raw)
+                else:
+                    logger.info(f"Duplicate update {raw.get('update_id')} in {key} skipped")
+            except Exception as e:
+                logger.exception(f"Update {entry_id} from {key} failed: {e}")
+            await redis.xack(key, GROUP, entry_id)
+
+
+async def run_worker(bot: Bot, dp: Dispatcher) -> None:
+    """Воркер: последовательно обрабатывает свои партиции, порядок апдейтов пользователя сохраняется"""
+    partitions = worker_partitions()
+    if not partitions:
+        raise RuntimeError(f"Worker {WORKER_INDEX} has no partitions (UPDATE_PARTITIONS={UPDATE_PARTITIONS})")
+
+    redis = Redis.from_url(REDIS_URL, decode_responses=False)
+    consumer = f"worker-{WORKER_INDEX}"
+    await dp.emit_startup(bot=bot, bots=[bot], dispatcher=dp)
+    logger.info(f"Worker {WORKER_INDEX} consuming partitions {partitions}")
+    try:
+        await asyncio.gather(*(
+            _consume_partition(redis, bot, dp, p, consumer) for p in partitions
+        ))
+    finally:
+        await dp.emit_shutdown(bot=bot, bots=[bot], dispatcher=dp)
+        await redis.close()
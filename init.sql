@@ -8,6 +8,8 @@ CREATE TABLE IF NOT EXISTS students (
     faculty TEXT
 );
 
+CREATE INDEX IF NOT EXISTS ix_students_balance_id ON students(balance, id);
+
 CREATE TABLE IF NOT EXISTS admins (
     id SERIAL PRIMARY KEY,
     user_id BIGINT UNIQUE NOT NULL
@@ -29,6 +31,7 @@ CREATE TABLE IF NOT EXISTS codes (
     starts_at TIMESTAMPTZ NULL,
     expires_at TIMESTAMPTZ NULL,
     max_uses INTEGER NULL,
+    uses_count INTEGER NOT NULL DEFAULT 0,
     CONSTRAINT ck_codes_income_only CHECK (is_income = TRUE)
 );
 
@@ -42,6 +45,8 @@ CREATE TABLE IF NOT EXISTS user_codes (
     PRIMARY KEY (user_id, code_id)
 );
 
+CREATE INDEX IF NOT EXISTS ix_user_codes_code ON user_codes(code_id);
+
 CREATE TABLE IF NOT EXISTS products (
     id SERIAL PRIMARY KEY,
     name TEXT NOT NULL,
@@ -130,3 +135,126 @@ ADD COLUMN IF NOT EXISTS reserved_until TIMESTAMPTZ;
 
 CREATE INDEX IF NOT EXISTS idx_orders_reserved_until
 ON orders(status, reserved_until);
+
+ALTER TABLE codes
+ADD COLUMN IF NOT EXISTS uses_count INTEGER NOT NULL DEFAULT 0;
+
+-- Бэкфилл счётчика: безопасно перезапускать, пересчитывает и обнуляет расхождения.
+UPDATE codes c
+SET uses_count = COALESCE(u.cnt, 0)
+FROM codes c2
+LEFT JOIN (
+    SELECT code_id, COUNT(*)::int AS cnt
+    FROM user_codes
+    GROUP BY code_id
+) u ON u.code_id = c2.id
+WHERE c2.id = c.id
+  AND c.uses_count IS DISTINCT FROM COALESCE(u.cnt, 0);
+
+-- Погашения добавляет redeem_code; удаления user_codes (каскад от students)
+-- уменьшают счётчик в той же транзакции.
+CREATE OR REPLACE FUNCTION codes_uses_count_on_release() RETURNS trigger AS $$
+BEGIN
+    UPDATE codes SET uses_count = GREATEST(uses_count - 1, 0) WHERE id = OLD.code_id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_user_codes_release ON user_codes;
+CREATE TRIGGER trg_user_codes_release
+AFTER DELETE ON user_codes
+FOR EACH ROW EXECUTE FUNCTION codes_uses_count_on_release();
+
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'PENDING',
+    created_by BIGINT NULL,
+    progress_chat_id BIGINT NULL,
+    progress_message_id BIGINT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_broadcast_jobs_status ON broadcast_jobs(status, id);
+
+CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+    job_id BIGINT NOT NULL REFERENCES broadcast_jobs(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT NULL,
+    updated_at TIMESTAMPTZ NULL,
+    PRIMARY KEY (job_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_broadcast_deliveries_pending
+ON broadcast_deliveries(job_id, user_id)
+WHERE status IN ('PENDING', 'SENDING');
+
+-- Журналы движений: только INSERT. students.balance и products.stock остаются
+-- материализованными итогами и меняются в той же транзакции, что и запись в журнал.
+CREATE TABLE IF NOT EXISTS points_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    delta INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    code_id INTEGER NULL,
+    order_id INTEGER NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_points_ledger_user ON points_ledger(user_id, id);
+
+CREATE TABLE IF NOT EXISTS stock_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    product_id INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    order_id INTEGER NULL,
+    actor_id BIGINT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_stock_ledger_product ON stock_ledger(product_id, reason);
+
+-- Входящие остатки для данных, появившихся до журналов: безопасно перезапускать.
+INSERT INTO points_ledger (user_id, delta, reason)
+SELECT s.id, s.balance, 'opening'
+FROM students s
+WHERE COALESCE(s.balance, 0) <> 0
+  AND NOT EXISTS (SELECT 1 FROM points_ledger pl WHERE pl.user_id = s.id);
+
+-- Склад: история заказов до журнала переносится строками reserve (RESERVED) и issue
+-- (FULFILLED), а входящий остаток дополняется ими, чтобы сумма журнала совпадала с products.stock.
+-- Выдача с total_points = 0 ничего не выдала (резерв вернулся на склад) и пропускается.
+-- Известное приближение: сколько выдано по каждой позиции при частичной выдаче, до журнала
+-- не сохранялось (только итог total_points), поэтому такие заказы переносятся полным qty.
+-- «Выдано» по ним завышено на невыданный остаток, а сумма журнала по товару остаётся верной.
+WITH fresh AS (
+    SELECT p.id, p.stock
+    FROM products p
+    WHERE NOT EXISTS (SELECT 1 FROM stock_ledger sl WHERE sl.product_id = p.id)
+),
+history AS (
+    SELECT oi.order_id, oi.product_id, oi.qty, o.status
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    JOIN fresh f ON f.id = oi.product_id
+    WHERE oi.qty > 0
+      AND (o.status = 'RESERVED'
+           OR (o.status = 'FULFILLED' AND o.total_points > 0))
+),
+opening AS (
+    SELECT f.id AS product_id,
+           f.stock + COALESCE((SELECT SUM(h.qty) FROM history h WHERE h.product_id = f.id), 0) AS delta
+    FROM fresh f
+)
+INSERT INTO stock_ledger (product_id, delta, reason, order_id)
+SELECT product_id, delta, 'opening', NULL::int
+FROM opening
+WHERE delta <> 0
+UNION ALL
+SELECT product_id, -qty, CASE status WHEN 'RESERVED' THEN 'reserve' ELSE 'issue' END, order_id
+FROM history;
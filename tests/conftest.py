@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# Модули бота импортируются как top-level пакеты (utils, texts, handlers...), как при запуске bot/bot.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-TOKEN")
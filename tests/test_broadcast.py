@@ -0,0 +1,16 @@
+import asyncio
+import time
+
+from utils.broadcast import TokenBucket
+
+
+def test_token_bucket_limits_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=5)
+        started = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # 5 из запаса сразу, ещё 10 — со скоростью 50/с
+    assert asyncio.run(scenario()) >= 0.18
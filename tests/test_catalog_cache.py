@@ -0,0 +1,49 @@
+import asyncio
+
+from utils.catalog_cache import CatalogCache
+
+
+def test_catalog_cache_single_flight_and_invalidate():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [{"id": len(calls)}]
+
+    async def scenario():
+        cache = CatalogCache(loader, ttl_seconds=60)
+        first = await asyncio.gather(*(cache.get() for _ in range(5)))
+        cached = await cache.get()
+        cache.invalidate()
+        fresh = await cache.get()
+        return first, cached, fresh
+
+    first, cached, fresh = asyncio.run(scenario())
+    assert all(x == [{"id": 1}] for x in first)
+    assert cached == [{"id": 1}]
+    assert fresh == [{"id": 2}]
+    assert len(calls) == 2
+
+
+def test_catalog_cache_drops_items_when_shared_version_changes():
+    version = {"v": 1}
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return [{"id": len(calls)}]
+
+    async def shared():
+        return version["v"]
+
+    async def scenario():
+        cache = CatalogCache(loader, ttl_seconds=60, shared_version=shared, recheck_seconds=0)
+        first = await cache.get()
+        same = await cache.get()
+        # Правка в другом процессе
+        version["v"] = 2
+        fresh = await cache.get()
+        return first, same, fresh
+
+    assert asyncio.run(scenario()) == ([{"id": 1}], [{"id": 1}], [{"id": 2}])
@@ -0,0 +1,15 @@
+from datetime import datetime, timedelta, timezone
+
+from utils.codes_cache import EXHAUSTED_TTL, EXPIRED_TTL, UNKNOWN_TTL, status_ttl
+
+
+def test_status_ttl():
+    now = datetime(2025, 4, 8, 12, 0, tzinfo=timezone.utc)
+    assert status_ttl(now, "pending", now + timedelta(minutes=5), None) == 300
+    assert status_ttl(now, "expired", None, now) == EXPIRED_TTL
+    assert status_ttl(now, "unknown", None, None) == UNKNOWN_TTL
+    assert status_ttl(now, "exhausted", None, now + timedelta(seconds=30)) == 30
+    assert status_ttl(now, "exhausted", None, now + timedelta(days=1)) == EXHAUSTED_TTL
+    assert status_ttl(now, "exhausted", None, None) == EXHAUSTED_TTL
+    assert status_ttl(now, "active", None, None) == 60
+    assert status_ttl(now, "active", None, now - timedelta(seconds=5)) == 1
@@ -0,0 +1,16 @@
+import core  # noqa: F401  — порядок импорта как в bot.py: core -> dp -> handlers
+from handlers.common import _deep_link_code
+
+
+class _Cmd:
+    def __init__(self, args):
+        self.args = args
+
+
+def test_deep_link_code():
+    assert _deep_link_code(_Cmd(" abcd1234 ")) == "ABCD1234"
+    assert _deep_link_code(_Cmd("abc")) is None
+    assert _deep_link_code(_Cmd("AB-CD")) is None
+    assert _deep_link_code(_Cmd("КОД1234")) is None
+    assert _deep_link_code(_Cmd(None)) is None
+    assert _deep_link_code(None) is None
@@ -0,0 +1,9 @@
+from utils.leaderboard import Leaderboard
+
+
+def test_member_order_matches_id_order():
+    ids = [5, 42, 1000, 987654321, 7412589630]
+    members = [Leaderboard._member(x) for x in ids]
+    # При равном балансе Redis сортирует участников как строки
+    assert sorted(members) == members
+    assert int(members[-1]) == ids[-1]
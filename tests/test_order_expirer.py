@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from utils import order_expirer
+
+
+class FakeSchedule:
+    def __init__(self, entries):
+        self.entries = dict(entries)
+
+    async def next_deadline(self):
+        return min(self.entries.values()) if self.entries else None
+
+    async def due(self, now, limit=1000):
+        return [k for k, v in self.entries.items() if v <= now]
+
+    async def remove(self, ids):
+        for x in ids:
+            self.entries.pop(x, None)
+
+    async def acquire_lock(self, token, ttl_ms):
+        return True
+
+    async def release_lock(self, token):
+        pass
+
+
+def _run_tick(monkeypatch, schedule, expired, live):
+    async def fake_expire_orders(limit):
+        out, expired[:] = list(expired), []
+        return out
+
+    async def fake_live(ids):
+        return [x for x in ids if x in live]
+
+    monkeypatch.setattr(order_expirer, "expire_orders", fake_expire_orders)
+    monkeypatch.setattr(order_expirer, "get_live_reservations", fake_live)
+    return asyncio.run(order_expirer._tick(schedule, "token"))
+
+
+def test_only_expired_and_gone_orders_leave_schedule(monkeypatch):
+    past = time.time() - 10
+    future = time.time() + 3600
+    # 1 — истёк; 2 — занят выдачей (SKIP LOCKED), ещё жив; 3 — уже выдан; 4 — в будущем
+    schedule = FakeSchedule({1: past, 2: past, 3: past, 4: future})
+
+    timeout = _run_tick(monkeypatch, schedule, expired=[1], live={2, 4})
+
+    assert set(schedule.entries) == {2, 4}
+    assert timeout == order_expirer.DUE_RETRY
+
+
+def test_nothing_due_sleeps_until_deadline(monkeypatch):
+    schedule = FakeSchedule({7: time.time() + 5})
+    timeout = _run_tick(monkeypatch, schedule, expired=[], live={7})
+    assert 0 < timeout <= 5
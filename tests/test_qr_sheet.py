@@ -0,0 +1,27 @@
+import os
+import time
+
+from utils import qr_sheet
+from utils.qr_sheet import is_deep_link_safe
+
+
+def test_is_deep_link_safe():
+    assert is_deep_link_safe("ABCD1234")
+    assert is_deep_link_safe("a_b-c")
+    assert not is_deep_link_safe("КОД1234")
+    assert not is_deep_link_safe("AB CD")
+    assert not is_deep_link_safe("A" * 65)
+    assert not is_deep_link_safe("")
+
+
+def test_prune_sheets_by_count_and_age(tmp_path, monkeypatch):
+    monkeypatch.setattr(qr_sheet, "QR_DIR", str(tmp_path))
+    now = time.time()
+    for i, age in enumerate([10, 20, 30, 40 * 86400]):
+        path = tmp_path / f"{i}.pdf"
+        path.write_bytes(b"%PDF")
+        os.utime(path, (now - age, now - age))
+    (tmp_path / "keep.txt").write_text("x")
+
+    assert qr_sheet.prune_sheets(max_files=2, max_age=7 * 86400) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["0.pdf", "1.pdf", "keep.txt"]
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+
+from texts import storage
+from texts.storage import CompiledTemplate, validate_template
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    path = tmp_path / "store.json"
+    path.write_text(json.dumps({"go_home": {"text": "old"}}), encoding="utf-8")
+    monkeypatch.setattr(storage, "_STORE_PATH", path)
+    monkeypatch.setattr(storage, "_store", None)
+    monkeypatch.setattr(storage, "_store_mtime", None)
+    monkeypatch.setattr(storage, "_checked_at", 0.0)
+    monkeypatch.setattr(storage, "STORE_RECHECK_SECONDS", 0.0)
+    return path
+
+
+def test_edit_from_another_process_is_picked_up(store_path):
+    async def scenario():
+        before = (await storage.get_template("go_home"))["text"]
+        # Правка другим процессом: атомарная подмена файла
+        storage._dump_store_sync({"go_home": {"text": "new"}})
+        after = (await storage.get_template("go_home"))["text"]
+        return before, after
+
+    assert asyncio.run(scenario()) == ("old", "new")
+
+
+def test_write_keeps_foreign_edits(store_path):
+    async def scenario():
+        await storage.get_template("go_home")
+        storage._dump_store_sync({"go_home": {"text": "foreign"}})
+        await storage.set_photo("go_home", "file-id")
+        return await storage.get_template("go_home")
+
+    tpl = asyncio.run(scenario())
+    assert tpl["text"] == "foreign"
+    assert tpl["photo"] == "file-id"
+
+
+def test_compiled_template_fills_fields():
+    tpl = CompiledTemplate("Баланс: {balance}, +{points}")
+    assert tpl.fields == {"balance", "points"}
+    assert tpl.fill(balance=10, points=5) == "Баланс: 10, +5"
+
+
+def test_compiled_template_keeps_source_on_missing_field():
+    tpl = CompiledTemplate("Баланс: {balance}")
+    assert tpl.fill() == "Баланс: {balance}"
+
+
+def test_compiled_template_reports_broken_braces():
+    tpl = CompiledTemplate("Баланс: {balance")
+    assert tpl.error is not None
+    assert tpl.fill(balance=1) == "Баланс: {balance"
+
+
+def test_validate_template():
+    assert validate_template("get_points_success", "+{points}, итого {balance}") is None
+    assert "Неизвестные плейсхолдеры" in validate_template("get_points_success", "{name}")
+    assert "фигурных скобках" in validate_template("get_points_success", "{points")
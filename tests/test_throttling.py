@@ -0,0 +1,80 @@
+import asyncio
+import types
+
+import pytest
+
+from middlewares.throttling import ThrottlingMiddleware
+
+
+class StubRedis:
+    def __init__(self, allow=True, fail=False):
+        self.allow = allow
+        self.fail = fail
+        self.keys = set()
+
+    def register_script(self, _source):
+        async def script(keys, args):
+            if self.fail:
+                raise ConnectionError("redis down")
+            return 1 if self.allow else 0
+        return script
+
+    async def set(self, key, value, px=None, ex=None, nx=False):
+        if self.fail:
+            raise ConnectionError("redis down")
+        if nx and key in self.keys:
+            return None
+        self.keys.add(key)
+        return True
+
+
+def _data():
+    return {"event_from_user": types.SimpleNamespace(id=42)}
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_handler_error_is_not_retried():
+    calls = []
+
+    async def handler(event, data):
+        calls.append(event)
+        raise RuntimeError("boom")
+
+    mw = ThrottlingMiddleware(StubRedis())
+    with pytest.raises(RuntimeError):
+        _run(mw(handler, object(), _data()))
+    assert len(calls) == 1
+
+
+def test_redis_failure_passes_update_through_once():
+    calls = []
+
+    async def handler(event, data):
+        calls.append(event)
+        return "ok"
+
+    mw = ThrottlingMiddleware(StubRedis(fail=True))
+    assert _run(mw(handler, object(), _data())) == "ok"
+    assert len(calls) == 1
+
+
+def test_over_limit_drops_update():
+    calls = []
+
+    async def handler(event, data):
+        calls.append(event)
+
+    mw = ThrottlingMiddleware(StubRedis(allow=False))
+    assert _run(mw(handler, object(), _data())) is None
+    assert calls == []
+
+
+def test_update_without_user_is_not_throttled():
+    async def handler(event, data):
+        return "ok"
+
+    mw = ThrottlingMiddleware(StubRedis(allow=False))
+    assert _run(mw(handler, object(), {})) == "ok"
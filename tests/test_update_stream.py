@@ -0,0 +1,47 @@
+import asyncio
+
+from utils.update_stream import _first_delivery, partition_for, update_user_id
+
+
+def test_update_user_id():
+    assert update_user_id({"update_id": 1, "message": {"from": {"id": 7}, "chat": {"id": -100}}}) == 7
+    assert update_user_id({"update_id": 1, "channel_post": {"chat": {"id": -100}}}) == -100
+    assert update_user_id({"update_id": 1, "callback_query": {"from": {"id": 9}}}) == 9
+    assert update_user_id({"update_id": 1}) == 0
+
+
+def test_partition_for_is_stable_per_user():
+    a = {"update_id": 1, "message": {"from": {"id": 12345}}}
+    b = {"update_id": 2, "callback_query": {"from": {"id": 12345}}}
+    assert partition_for(a, 8) == partition_for(b, 8) == 12345 % 8
+    assert partition_for({"update_id": 3}, 8) == 0
+    assert partition_for(a, 0) == 0
+
+
+class _StubRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+
+def test_first_delivery_skips_republished_update():
+    async def scenario():
+        redis = _StubRedis()
+        raw = {"update_id": 10, "message": {"from": {"id": 1}}}
+        return (
+            await _first_delivery(redis, raw, b"1-0"),
+            # Дочитывание той же записи после рестарта воркера
+            await _first_delivery(redis, raw, b"1-0"),
+            # Повторная публикация ingress после падения
+            await _first_delivery(redis, raw, b"2-0"),
+        )
+
+    assert asyncio.run(scenario()) == (True, True, False)